@@ -1,109 +1,149 @@
-from typing import Optional, Tuple
-import tinify
+from typing import Optional, Tuple, Dict, Any
 from log_handlers.api_logger import APILogger
 from datetime import datetime
 from database.user_db import update_user_stats
-from config import TINIFY_API_KEY
-from database.mongodb import db
-import os
+from database.api_db import get_user_api_key
+from api_management.compression_cache import compression_cache
+from api_management.backends import CompressionBackend, get_backend
+from config import COMPRESSION_BACKEND, COMPRESSION_FALLBACK_BACKEND
+from utils.single_flight import SingleFlight
+from utils.usage_quota import usage_quota
 from pyrogram.types import Message
 from components.keyboards import Keyboards
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Shared across handlers so identical content is only sent to the API once
+_content_flights = SingleFlight()
+
 class APIHandler:
-    """Handler for interacting with the TinyPNG API."""
+    """Handler for compressing images through the configured backends."""
 
     def __init__(self):
         self.api_logger = APILogger()
-        self.default_api_key = os.getenv("TINIFY_API_KEY")
-        tinify.key = self.default_api_key  # Initialize the API key
-        self._api_cache = {}
+        self.cache = compression_cache
+        self.in_flight = _content_flights
 
-    async def get_api_key(self, user_id: int) -> str:
+    async def get_api_key(self, user_id: int) -> Optional[str]:
         """
-        Retrieve the user's API key or return the default key if none is set.
+        Retrieve the user's custom API key.
 
         Args:
             user_id (int): The Telegram user ID.
 
         Returns:
-            str: The API key to be used.
+            Optional[str]: The user's key, or None to use the operator key pool.
         """
-        try:
-            if user_id in self._api_cache:
-                return self._api_cache[user_id]
-            
-            user_key = await self._get_user_api_key(user_id)
-            if user_key:
-                self._api_cache[user_id] = user_key
-                return user_key
-            
-            return self.default_api_key
-        except Exception as e:
-            logger.error(f"Error getting API key: {str(e)}")
-            return self.default_api_key
+        return await get_user_api_key(user_id)
 
-    async def compress_image(
+    async def compress_buffer(
         self,
-        input_path: str,
+        data: bytes,
         user_id: int,
-        output_path: str
+        options: Optional[Dict[str, Any]] = None
     ) -> dict:
         """
-        Compress an image using TinyPNG API.
-        
+        Compress image bytes with the configured backend.
+
+        Identical inputs compressed with the same options are served from
+        the content-addressed cache without an API call. If the backend
+        fails, the job is retried on ``COMPRESSION_FALLBACK_BACKEND``.
+
         Args:
-            input_path (str): Path to input image
+            data (bytes): Image to compress
             user_id (int): User ID for API key lookup
-            output_path (str): Path to save compressed image
-        
+            options (Optional[Dict[str, Any]]): Compression options, part of the
+                cache key; ``backend`` picks the engine for this job
+
         Returns:
-            dict: Compression results
+            dict: Compression results, with the compressed image under ``data``
         """
         try:
-            # Verify input file exists
-            if not os.path.exists(input_path):
-                return {"success": False, "error": "Input file not found"}
+            content_hash = await self.cache.hash_bytes(data)
 
-            # Get API key
-            api_key = await self.get_api_key(user_id)
-            tinify.key = api_key or self.default_api_key
+            options = options or {}
+            backend_names = [options.get("backend") or COMPRESSION_BACKEND]
+            if COMPRESSION_FALLBACK_BACKEND and COMPRESSION_FALLBACK_BACKEND not in backend_names:
+                backend_names.append(COMPRESSION_FALLBACK_BACKEND)
 
-            if not tinify.key:
-                return {"success": False, "error": "No API key available"}
+            result = {"success": False, "error": "No compression backend available"}
+            for name in backend_names:
+                backend = get_backend(name)
+                if not backend:
+                    logger.error(f"Unknown compression backend: {name}")
+                    continue
 
-            # Compress image
-            source = tinify.from_file(input_path)
-            source.to_file(output_path)
+                cache_key = self.cache.make_key(content_hash, {**options, "backend": name})
+                result = await self._compress_cached(backend, data, user_id, cache_key)
+                if result.get("success", False):
+                    await self._record_usage(user_id, result)
+                    return result
+                logger.warning(f"{name} backend failed: {result.get('error')}")
 
-            if not os.path.exists(output_path):
-                return {"success": False, "error": "Failed to save compressed image"}
-
-            return {
-                "success": True,
-                "original_size": os.path.getsize(input_path),
-                "compressed_size": os.path.getsize(output_path)
-            }
+            return result
 
         except Exception as e:
             logger.error(f"Compression error: {str(e)}", exc_info=True)
             return {"success": False, "error": str(e)}
 
-    async def _get_user_api_key(self, user_id: int) -> Optional[str]:
-        """
-        Retrieve user's custom API key from database.
+    async def _compress_cached(
+        self,
+        backend: CompressionBackend,
+        data: bytes,
+        user_id: int,
+        cache_key: str
+    ) -> dict:
+        """Serve a job from the cache, or compress it once for all concurrent callers."""
+        compressed = await self.cache.get(cache_key, len(data))
+        if compressed is not None:
+            return {
+                "success": True,
+                "cached": True,
+                "backend": backend.name,
+                "data": compressed,
+                "original_size": len(data),
+                "compressed_size": len(compressed)
+            }
 
-        Args:
-            user_id (int): The Telegram user ID.
+        # Concurrent requests for the same content wait on one backend call
+        result, joined = await self.in_flight.run(
+            cache_key,
+            lambda: self._compress_uncached(backend, data, user_id, cache_key)
+        )
+        if joined and result.get("success", False):
+            return {**result, "cached": True}
+        return result
 
-        Returns:
-            Optional[str]: The user's custom API key.
-        """
+    async def _compress_uncached(
+        self,
+        backend: CompressionBackend,
+        data: bytes,
+        user_id: int,
+        cache_key: str
+    ) -> dict:
+        """Compress through a backend and store the result in the cache."""
         try:
-            result = await db.api_keys.find_one({"user_id": user_id})
-            return result["api_key"] if result else None
+            api_key = await self.get_api_key(user_id) if backend.uses_api_key else None
+            compressed = await backend.compress(data, api_key)
+            if compressed is None:
+                return {"success": False, "error": "No API key available"}
+
+            await self.cache.put(cache_key, compressed)
+
+            return {
+                "success": True,
+                "cached": False,
+                "backend": backend.name,
+                "data": compressed,
+                "original_size": len(data),
+                "compressed_size": len(compressed)
+            }
         except Exception as e:
-            logger.error(f"Error retrieving API key: {str(e)}")
-            return None
\ No newline at end of file
+            logger.error(f"{backend.name} compression error: {str(e)}", exc_info=True)
+            return {"success": False, "error": str(e)}
+
+    async def _record_usage(self, user_id: int, result: dict) -> None:
+        """Count a successful compression towards the user's quota and stats."""
+        usage_quota.record(user_id, result["original_size"])
+        await update_user_stats(user_id, result["original_size"], result["compressed_size"])
@@ -0,0 +1,169 @@
+from typing import Dict, Optional
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+import asyncio
+import multiprocessing
+import tinify
+from PIL import Image
+from api_management.compression_executor import compression_executor
+from api_management.key_pool import api_key_pool
+from config import LOCAL_COMPRESSION_WORKERS, LOCAL_JPEG_QUALITY
+import logging
+
+logger = logging.getLogger(__name__)
+
+class CompressionBackend(ABC):
+    """Interface implemented by every compression engine."""
+
+    name = ""
+    uses_api_key = False
+
+    @abstractmethod
+    async def compress(self, data: bytes, api_key: Optional[str] = None) -> Optional[bytes]:
+        """
+        Compress image bytes.
+
+        Args:
+            data (bytes): Image to compress
+            api_key (Optional[str]): User's own key, for backends that use one
+
+        Returns:
+            Optional[bytes]: The compressed image, or None if the backend
+            cannot take the job right now
+        """
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get backend load figures for the admin dashboard."""
+        return {}
+
+    def shutdown(self) -> None:
+        """Release worker pools on bot shutdown."""
+
+class TinifyBackend(CompressionBackend):
+    """TinyPNG API backend using the user's key or the operator key pool."""
+
+    name = "tinify"
+    uses_api_key = True
+
+    def __init__(self):
+        self.executor = compression_executor
+        self.key_pool = api_key_pool
+
+    async def compress(self, data: bytes, api_key: Optional[str] = None) -> Optional[bytes]:
+        if api_key:
+            compressed, _ = await self.executor.compress_buffer(api_key, data)
+            return compressed
+
+        # Move on to the next operator key on account errors
+        while True:
+            pool_key = self.key_pool.acquire()
+            if not pool_key:
+                return None
+
+            compression_count = None
+            try:
+                compressed, compression_count = await self.executor.compress_buffer(pool_key, data)
+                return compressed
+            except tinify.AccountError as e:
+                self.key_pool.disable(pool_key, str(e))
+            finally:
+                self.key_pool.release(pool_key, compression_count)
+
+    def get_stats(self) -> Dict[str, int]:
+        return self.executor.get_stats()
+
+    def shutdown(self) -> None:
+        self.executor.shutdown()
+
+class PillowBackend(CompressionBackend):
+    """Offline backend re-encoding images with Pillow on a process pool."""
+
+    name = "local"
+
+    def __init__(self, max_workers: int = LOCAL_COMPRESSION_WORKERS, quality: int = LOCAL_JPEG_QUALITY):
+        self.max_workers = max_workers
+        self.quality = quality
+        # Worker processes are only spawned once the backend is first used
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._in_flight = 0
+
+    async def compress(self, data: bytes, api_key: Optional[str] = None) -> Optional[bytes]:
+        loop = asyncio.get_running_loop()
+        if self._pool is None:
+            # By now the process runs several thread pools; forking it could
+            # copy a lock some other thread holds, so start clean workers
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("forkserver")
+            )
+        self._in_flight += 1
+        try:
+            return await loop.run_in_executor(
+                self._pool,
+                _compress_with_pillow,
+                data,
+                self.quality
+            )
+        finally:
+            self._in_flight -= 1
+
+    def get_stats(self) -> Dict[str, int]:
+        return {"workers": self.max_workers, "in_flight": self._in_flight}
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+def _compress_with_pillow(data: bytes, quality: int) -> bytes:
+    """Re-encode an image with Pillow; runs inside a worker process."""
+    output = BytesIO()
+    with Image.open(BytesIO(data)) as img:
+        image_format = img.format
+        # Without its colour profile a wide-gamut (e.g. Display P3) image shifts colour
+        icc_profile = img.info.get("icc_profile")
+        profile = {"icc_profile": icc_profile} if icc_profile else {}
+
+        # Re-encoding would keep only the first frame; MPO extra frames are
+        # just camera previews, so those are still saved as a plain JPEG
+        if image_format != "MPO" and getattr(img, "is_animated", False):
+            return data
+
+        if image_format in ("JPEG", "MPO"):
+            exif = img.info.get("exif")
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            # Keep EXIF so the orientation tag survives
+            img.save(
+                output,
+                "JPEG",
+                quality=quality,
+                optimize=True,
+                progressive=True,
+                **profile,
+                **({"exif": exif} if exif else {})
+            )
+        elif image_format == "PNG":
+            # Palette reduction, the same trick TinyPNG relies on
+            if img.mode in ("RGBA", "LA"):
+                img = img.convert("RGBA").quantize(colors=256, method=Image.Quantize.FASTOCTREE)
+            elif img.mode != "P":
+                img = img.convert("RGB").quantize(colors=256)
+            img.save(output, "PNG", optimize=True, **profile)
+        elif image_format == "WEBP":
+            img.save(output, "WEBP", quality=quality, method=6, **profile)
+        else:
+            img.save(output, image_format, optimize=True, **profile)
+
+    # Never hand back something bigger than the original
+    compressed = output.getvalue()
+    return compressed if len(compressed) < len(data) else data
+
+BACKENDS: Dict[str, CompressionBackend] = {
+    backend.name: backend for backend in (TinifyBackend(), PillowBackend())
+}
+
+def get_backend(name: str) -> Optional[CompressionBackend]:
+    """Look up a backend by its configured name."""
+    return BACKENDS.get(name)
@@ -0,0 +1,171 @@
+from typing import Dict, Any, Optional
+from collections import OrderedDict
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+from config import COMPRESSION_CACHE_DIR, COMPRESSION_CACHE_MAX_BYTES
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Suffix of entries still being written
+TEMP_SUFFIX = ".tmp"
+
+class CompressionCache:
+    """
+    Content-addressed on-disk cache of compressed images.
+
+    Entries are keyed by a hash of the input bytes plus the compression
+    options and evicted least-recently-used first once the store grows
+    past ``max_bytes``.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = COMPRESSION_CACHE_DIR,
+        max_bytes: int = COMPRESSION_CACHE_MAX_BYTES
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> compressed size, oldest first
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._load_index()
+
+    @staticmethod
+    def make_key(content_hash: str, options: Optional[Dict[str, Any]] = None) -> str:
+        """Build a cache key from an image content hash and compression options."""
+        digest = hashlib.sha256(content_hash.encode())
+        digest.update(json.dumps(options or {}, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    async def hash_bytes(self, data: bytes) -> str:
+        """Hash image content off the event loop."""
+        return await asyncio.to_thread(self._hash_bytes, data)
+
+    async def get(self, key: str, original_size: int = 0) -> Optional[bytes]:
+        """
+        Read a cached result.
+
+        Args:
+            key (str): Cache key from ``make_key``
+            original_size (int): Input size, counted as saved API traffic on a hit
+
+        Returns:
+            Optional[bytes]: The compressed image on a cache hit
+        """
+        if key not in self._entries:
+            self.misses += 1
+            return None
+
+        try:
+            data = await asyncio.to_thread(self._read_entry, self._path_for(key))
+        except OSError as e:
+            logger.warning(f"Dropping unreadable cache entry {key}: {str(e)}")
+            self._drop(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        self.bytes_saved += original_size
+        return data
+
+    async def put(self, key: str, data: bytes) -> None:
+        """Store a compressed image under ``key`` and evict old entries."""
+        try:
+            size = len(data)
+            if size > self.max_bytes:
+                return
+
+            await asyncio.to_thread(self._write_entry, self._path_for(key), data)
+            if key in self._entries:
+                self._total_bytes -= self._entries[key]
+            self._entries[key] = size
+            self._entries.move_to_end(key)
+            self._total_bytes += size
+            self._evict()
+        except Exception as e:
+            logger.error(f"Error storing cache entry {key}: {str(e)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache hit/miss counters and store size."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size": self._total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) * 100 if lookups else 0,
+            "bytes_saved": self.bytes_saved
+        }
+
+    def _path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    @staticmethod
+    def _hash_bytes(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def _read_entry(cache_path: str) -> bytes:
+        with open(cache_path, "rb") as f:
+            data = f.read()
+        # Touch the entry so LRU order survives a restart
+        os.utime(cache_path)
+        return data
+
+    @staticmethod
+    def _write_entry(cache_path: str, data: bytes) -> None:
+        # Written aside and renamed, so a crash or full disk never leaves a truncated entry
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix=TEMP_SUFFIX)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, cache_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def _drop(self, key: str) -> None:
+        size = self._entries.pop(key, 0)
+        self._total_bytes -= size
+        try:
+            os.remove(self._path_for(key))
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        while self._total_bytes > self.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            logger.debug(f"Evicted cache entry {oldest}")
+
+    def _load_index(self) -> None:
+        """Rebuild the LRU index from files already on disk."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        files = []
+        for name in os.listdir(self.cache_dir):
+            path = self._path_for(name)
+            if name.endswith(TEMP_SUFFIX):
+                # Left over from an interrupted write
+                os.remove(path)
+            elif os.path.isfile(path):
+                stat = os.stat(path)
+                files.append((stat.st_mtime, name, stat.st_size))
+
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._total_bytes += size
+        self._evict()
+        logger.info(
+            f"Compression cache loaded: {len(self._entries)} entries, "
+            f"{self._total_bytes} bytes"
+        )
+
+# Shared cache so every handler benefits from the same store
+compression_cache = CompressionCache()
@@ -0,0 +1,122 @@
+from typing import Dict, Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import threading
+import tinify
+from config import COMPRESSION_WORKERS
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Tinify clients kept per worker thread; custom keys beyond this are evicted LRU
+CLIENTS_PER_WORKER = 8
+
+class CompressionExecutor:
+    """
+    Runs blocking TinyPNG calls on a bounded thread pool.
+
+    Every job carries its own API key and is served by a tinify client
+    owned by the worker thread, so concurrent jobs never share the
+    process-global ``tinify.key``.
+    """
+
+    def __init__(self, max_workers: int = COMPRESSION_WORKERS):
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="tinify"
+        )
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._in_flight = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of jobs waiting for a free worker."""
+        return self._queued
+
+    @property
+    def in_flight(self) -> int:
+        """Number of jobs currently talking to TinyPNG."""
+        return self._in_flight
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get a snapshot of the executor load."""
+        return {
+            "workers": self.max_workers,
+            "queue_depth": self._queued,
+            "in_flight": self._in_flight
+        }
+
+    async def compress_buffer(self, api_key: str, data: bytes) -> Tuple[bytes, Optional[int]]:
+        """
+        Compress image bytes without blocking the event loop.
+
+        Args:
+            api_key (str): TinyPNG API key used for this job only
+            data (bytes): Image to compress
+
+        Returns:
+            Tuple[bytes, Optional[int]]: Compressed image and the compression
+            count reported by TinyPNG for the key
+        """
+        loop = asyncio.get_running_loop()
+        # Whoever sees the job leave the queue first, worker or canceller, counts it
+        job = {"dequeued": False}
+        with self._lock:
+            self._queued += 1
+        try:
+            return await loop.run_in_executor(
+                self._pool,
+                self._compress_buffer,
+                api_key,
+                data,
+                job
+            )
+        finally:
+            self._dequeue(job)
+
+    def shutdown(self) -> None:
+        """Stop accepting jobs and wait for running ones to finish."""
+        self._pool.shutdown(wait=True)
+
+    def _dequeue(self, job: dict) -> None:
+        with self._lock:
+            if not job["dequeued"]:
+                job["dequeued"] = True
+                self._queued -= 1
+
+    def _compress_buffer(self, api_key: str, data: bytes, job: dict) -> Tuple[bytes, Optional[int]]:
+        self._dequeue(job)
+        with self._lock:
+            self._in_flight += 1
+        try:
+            client = self._get_client(api_key)
+            shrink = client.request("POST", "/shrink", data)
+            result = client.request("GET", shrink.headers.get("location"))
+
+            count = shrink.headers.get("compression-count")
+            return result.content, int(count) if count else None
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _get_client(self, api_key: str) -> "tinify.Client":
+        """Get the calling thread's tinify client for an API key."""
+        clients = getattr(self._local, "clients", None)
+        if clients is None:
+            clients = self._local.clients = OrderedDict()
+        client = clients.get(api_key)
+        if client is None:
+            client = clients[api_key] = tinify.Client(api_key)
+            if len(clients) > CLIENTS_PER_WORKER:
+                _, evicted = clients.popitem(last=False)
+                evicted.close()
+        else:
+            clients.move_to_end(api_key)
+        return client
+
+# Shared executor so the pool bound holds across all handlers
+compression_executor = CompressionExecutor()
@@ -0,0 +1,103 @@
+from typing import Dict, Any, List, Optional
+from datetime import datetime
+from config import TINIFY_API_KEYS, TINIFY_MONTHLY_LIMIT
+import logging
+
+logger = logging.getLogger(__name__)
+
+class APIKeyPool:
+    """
+    Pool of operator TinyPNG keys with quota-aware load balancing.
+
+    Jobs are routed to the key with the most remaining monthly headroom.
+    Keys rejected by TinyPNG are taken out of rotation until the quota
+    resets at the start of the next month.
+    """
+
+    def __init__(self, keys: List[str] = TINIFY_API_KEYS, monthly_limit: int = TINIFY_MONTHLY_LIMIT):
+        self.monthly_limit = monthly_limit
+        self._month = self._current_month()
+        self._keys: Dict[str, Dict[str, Any]] = {
+            key: self._new_state() for key in keys
+        }
+
+    def acquire(self) -> Optional[str]:
+        """
+        Reserve the key with the most headroom for one compression.
+
+        Returns:
+            Optional[str]: The API key, or None if every key is exhausted
+        """
+        self._roll_month()
+        best_key = None
+        best_headroom = 0
+        for key, state in self._keys.items():
+            if state["disabled"]:
+                continue
+            headroom = self.monthly_limit - state["compression_count"] - state["in_flight"]
+            if headroom > best_headroom:
+                best_key, best_headroom = key, headroom
+
+        if best_key:
+            self._keys[best_key]["in_flight"] += 1
+        return best_key
+
+    def release(self, key: str, compression_count: Optional[int] = None) -> None:
+        """
+        Return a key after a compression finished.
+
+        Args:
+            key (str): Key from ``acquire``
+            compression_count (Optional[int]): Count reported by TinyPNG, if any
+        """
+        state = self._keys.get(key)
+        if not state:
+            return
+        state["in_flight"] = max(0, state["in_flight"] - 1)
+        if compression_count is not None:
+            state["compression_count"] = compression_count
+
+    def disable(self, key: str, reason: str) -> None:
+        """Take a key out of rotation after an account or limit error."""
+        state = self._keys.get(key)
+        if state and not state["disabled"]:
+            state["disabled"] = reason
+            logger.warning(f"API key {self.mask(key)} removed from rotation: {reason}")
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """Get per-key usage for the admin dashboard."""
+        self._roll_month()
+        return [
+            {
+                "key": self.mask(key),
+                "compression_count": state["compression_count"],
+                "in_flight": state["in_flight"],
+                "disabled": state["disabled"]
+            }
+            for key, state in self._keys.items()
+        ]
+
+    @staticmethod
+    def mask(key: str) -> str:
+        """Hide all but the last characters of a key for logs."""
+        return f"…{key[-4:]}"
+
+    def _roll_month(self) -> None:
+        """Reset counters and re-enable keys when TinyPNG's quota resets."""
+        month = self._current_month()
+        if month != self._month:
+            self._month = month
+            for state in self._keys.values():
+                state.update(self._new_state(), in_flight=state["in_flight"])
+            logger.info("Monthly quota reset, all API keys back in rotation")
+
+    @staticmethod
+    def _current_month() -> str:
+        return datetime.utcnow().strftime("%Y-%m")
+
+    @staticmethod
+    def _new_state() -> Dict[str, Any]:
+        return {"compression_count": 0, "in_flight": 0, "disabled": None}
+
+# Shared pool so headroom is tracked across all handlers
+api_key_pool = APIKeyPool()
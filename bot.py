@@ -1,6 +1,7 @@
 import os
 import asyncio
 import logging
+import time
 from pyrogram import Client, filters, idle
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from dotenv import load_dotenv
@@ -8,10 +9,12 @@ import tinify
 from utils import clean_temp_files, cleanup_old_data
 from utils.decorators import rate_limit
 from api_management.api_handler import APIHandler
+from api_management.backends import BACKENDS
 from api_management import APISettings
 from commands import (
     start_command,
     admin_dashboard,
+    detailed_stats,
     usage_stats,
     broadcast_command,
     ban_user,
@@ -23,12 +26,22 @@ from config import (
     ERROR_MESSAGES,
     RATE_LIMIT_SECONDS,
     LOG_CHANNEL_ID,
-    BOT_VERSION
+    BOT_VERSION,
+    QUOTA_RECONCILE_MINUTES,
+    STATS_FLUSH_SECONDS
 )
 from database.mongodb import mongodb, db
+from database.stats_writer import stats_writer
+from database.stats_db import seed_rollups
+from database.change_watcher import change_watcher
+from database.ban_list import ban_list
+from handlers.ban_filter import banned, drop_banned_update
 from handlers.file_handler import FileHandler
 from handlers.button_handlers import ButtonHandler
-from handlers.url_handler import URLHandler
+from handlers.url_handler import URLHandler, txt_document
+from handlers.compression_pipeline import compression_pipeline
+from utils.http_client import download_client
+from utils.usage_quota import usage_quota
 from datetime import datetime
 from log_handlers.channel_logger import ChannelLogger
 from components.keyboards import Keyboards
@@ -59,23 +72,43 @@ if missing_vars:
 if not os.path.exists('temp'):
     os.makedirs('temp')
 
+async def prepare_database():
+    """Connect to MongoDB, build indexes and load the in-memory state."""
+    await mongodb.connect()
+    await mongodb.init_indexes()
+
+    # Load today's usage so quotas hold across restarts
+    await asyncio.gather(
+        usage_quota.hydrate(),
+        seed_rollups(),
+        ban_list.load()
+    )
+
 async def start_bot():
     """Initialize bot and verify configurations."""
+    started = time.monotonic()
     try:
-        # Initialize MongoDB indexes
-        await mongodb.init_indexes()
-        
-        # Start the bot
-        await app.start()
+        # Database setup and the Telegram login don't depend on each other
+        await asyncio.gather(prepare_database(), app.start())
+
+        # Start the processing pipeline workers and URL download pool
+        compression_pipeline.start()
+        await download_client.start()
+        change_watcher.start()
         
         # Register handlers
+        # Group -1 runs first, banned users' updates stop here
+        app.add_handler(MessageHandler(drop_banned_update, banned), group=-1)
+        app.add_handler(CallbackQueryHandler(drop_banned_update, banned), group=-1)
         app.add_handler(MessageHandler(start_command, filters.command("start")))
         app.add_handler(MessageHandler(broadcast_command, filters.command("broadcast")))
         app.add_handler(MessageHandler(ban_user, filters.command("ban")))
         app.add_handler(MessageHandler(unban_user, filters.command("unban")))
         app.add_handler(MessageHandler(banned_users_list, filters.command("banned_users")))
         app.add_handler(MessageHandler(admin_dashboard, filters.command("admin")))
+        app.add_handler(MessageHandler(detailed_stats, filters.command("adminstats")))
         app.add_handler(MessageHandler(usage_stats, filters.command("stats")))
+        app.add_handler(MessageHandler(url_handler.handle_document, txt_document))
         app.add_handler(MessageHandler(file_handler.handle, filters.photo | filters.document))
         app.add_handler(CallbackQueryHandler(button_handler.handle))
         app.add_handler(MessageHandler(url_handler.handle, filters.regex(r'https?://[^\s]+')))
@@ -84,21 +117,26 @@ async def start_bot():
         # Initialize scheduler
         scheduler = AsyncIOScheduler()
         scheduler.add_job(cleanup_old_data, 'interval', hours=1)
+        scheduler.add_job(usage_quota.reconcile, 'interval', minutes=QUOTA_RECONCILE_MINUTES)
+        scheduler.add_job(stats_writer.flush, 'interval', seconds=STATS_FLUSH_SECONDS)
         # Add temp files cleanup job
         scheduler.add_job(clean_temp_files, 'interval', hours=2, args=[["temp"]])
         
         # Start scheduler
         scheduler.start()
         
+        cold_start = time.monotonic() - started
+
         # Send startup message
         await app.send_message(
             LOG_CHANNEL_ID,
             f"🟢 Bot Started\nVersion: {BOT_VERSION}\n"
-            f"Start Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+            f"Start Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+            f"Cold Start: {cold_start:.2f}s",
             parse_mode=ParseMode.HTML
         )
         
-        logger.info("Bot started successfully!")
+        logger.info(f"Bot started successfully in {cold_start:.2f}s!")
         
         # Keep the bot running
         await idle()
@@ -107,7 +145,14 @@ async def start_bot():
         logger.error(f"Error starting bot: {str(e)}")
         raise
     finally:
+        await compression_pipeline.stop()
+        await change_watcher.stop()
+        # Write out buffered stats before the connection goes away
+        await stats_writer.flush()
+        await download_client.close()
         await app.stop()
+        for backend in BACKENDS.values():
+            backend.shutdown()
 
 if __name__ == "__main__":
     try:
@@ -1,5 +1,6 @@
 from .start import start_command
 from .admin_dashboard import admin_dashboard
+from .admin_stats import detailed_stats
 from .stats import usage_stats
 from .broadcast import broadcast_command
 from .user_management import ban_user, unban_user, banned_users_list
@@ -8,6 +9,7 @@ from .support import support_command
 __all__ = [
     'start_command',
     'admin_dashboard',
+    'detailed_stats',
     'usage_stats',
     'broadcast_command',
     'ban_user',
@@ -1,8 +1,16 @@
 from pyrogram import Client
 from pyrogram.types import Message
+from pyrogram.enums import ParseMode
 from utils.decorators import admin_only
-from database.mongodb import db
-from datetime import datetime, timedelta
+from database.stats_db import get_dashboard_rollups
+from api_management.compression_executor import compression_executor
+from api_management.backends import get_backend
+from api_management.compression_cache import compression_cache
+from api_management.key_pool import api_key_pool
+from handlers.compression_pipeline import compression_pipeline
+from database.stats_writer import stats_writer
+from utils.helpers import format_size
+from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,61 +18,74 @@ logger = logging.getLogger(__name__)
 @admin_only
 async def detailed_stats(client: Client, message: Message) -> None:
     try:
-        # Time periods
+        # Counters are pre-aggregated by the stats writer, so this is one small query
         now = datetime.now()
-        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        yesterday = today - timedelta(days=1)
-        this_month = today.replace(day=1)
-        
-        # Get statistics
-        stats = {
-            "users": {
-                "total": await db.users.count_documents({}),
-                "today": await db.users.count_documents({"joined_date": {"$gte": today}}),
-                "yesterday": await db.users.count_documents({
-                    "joined_date": {
-                        "$gte": yesterday,
-                        "$lt": today
-                    }
-                }),
-                "this_month": await db.users.count_documents({
-                    "joined_date": {"$gte": this_month}
-                })
-            },
-            "compressions": {
-                "total": await db.usage_stats.count_documents({}),
-                "today": await db.usage_stats.count_documents({
-                    "date": {"$gte": today}
-                }),
-                "yesterday": await db.usage_stats.count_documents({
-                    "date": {
-                        "$gte": yesterday,
-                        "$lt": today
-                    }
-                }),
-                "this_month": await db.usage_stats.count_documents({
-                    "date": {"$gte": this_month}
-                })
-            }
-        }
+        rollups = await get_dashboard_rollups(datetime.utcnow())
+
+        engine = compression_executor.get_stats()
+        local = get_backend("local").get_stats()
+        cache = compression_cache.get_stats()
+        writes = stats_writer.get_stats()
+        queue = compression_pipeline.scheduler.get_stats()
+        stages = compression_pipeline.get_stats()
+        stages_text = ""
+        for i, stage in enumerate(stages):
+            branch = "└" if i == len(stages) - 1 else "├"
+            stages_text += (
+                f"{branch} {stage['name'].title()}: {stage['busy']}/{stage['workers']} busy, "
+                f"{stage['queued']} queued\n"
+            )
+
+        keys = api_key_pool.get_stats()
+        keys_text = ""
+        for i, key in enumerate(keys):
+            branch = "└" if i == len(keys) - 1 else "├"
+            status = " ⛔️" if key["disabled"] else ""
+            keys_text += (
+                f"{branch} {key['key']}: "
+                f"{key['compression_count']:,}/{api_key_pool.monthly_limit:,}{status}\n"
+            )
 
         # Format message
         stats_text = (
             "📊 <b>Detailed Statistics</b>\n\n"
             f"👥 <b>Users</b>\n"
-            f"├ Total: {stats['users']['total']:,}\n"
-            f"├ Today: {stats['users']['today']:,}\n"
-            f"├ Yesterday: {stats['users']['yesterday']:,}\n"
-            f"└ This Month: {stats['users']['this_month']:,}\n\n"
+            f"├ Total: {rollups['total']['new_users']:,}\n"
+            f"├ Today: {rollups['today']['new_users']:,}\n"
+            f"├ Yesterday: {rollups['yesterday']['new_users']:,}\n"
+            f"└ This Month: {rollups['this_month']['new_users']:,}\n\n"
             f"🖼 <b>Compressions</b>\n"
-            f"├ Total: {stats['compressions']['total']:,}\n"
-            f"├ Today: {stats['compressions']['today']:,}\n"
-            f"├ Yesterday: {stats['compressions']['yesterday']:,}\n"
-            f"└ This Month: {stats['compressions']['this_month']:,}\n\n"
+            f"├ Total: {rollups['total']['compressions']:,}\n"
+            f"├ Today: {rollups['today']['compressions']:,}\n"
+            f"├ Yesterday: {rollups['yesterday']['compressions']:,}\n"
+            f"├ This Month: {rollups['this_month']['compressions']:,}\n"
+            f"└ Space Saved: {format_size(rollups['total']['size_saved'])}\n\n"
+            f"⚙️ <b>Compression Engine</b>\n"
+            f"├ Workers: {engine['workers']}\n"
+            f"├ In Flight: {engine['in_flight']}\n"
+            f"├ Queued: {engine['queue_depth']}\n"
+            f"└ Local: {local['in_flight']}/{local['workers']} busy\n\n"
+            f"🏭 <b>Pipeline</b>\n"
+            f"├ Waiting: {queue['queued']} jobs from {queue['users']} users\n"
+            f"├ Avg Wait: {queue['avg_wait']:.2f}s\n"
+            f"├ Avg Processing: {queue['avg_processing']:.2f}s\n"
+            f"{stages_text}\n"
+            f"🗄 <b>Result Cache</b>\n"
+            f"├ Hit Rate: {cache['hit_rate']:.1f}% "
+            f"({cache['hits']:,} hits / {cache['misses']:,} misses)\n"
+            f"├ Entries: {cache['entries']:,} ({format_size(cache['size'])})\n"
+            f"└ Bytes Saved: {format_size(cache['bytes_saved'])}\n\n"
+            f"📝 <b>Stats Writer</b>\n"
+            f"├ Pending: {writes['pending']:,}\n"
+            f"├ Last Flush: {writes['last_flush_size']:,} writes in {writes['last_flush_duration']:.3f}s\n"
+            f"├ Lag: {writes['last_flush_lag']:.2f}s\n"
+            f"└ Dropped Logs: {writes['dropped_logs']:,}\n\n"
+            f"🔑 <b>API Key Pool</b>\n"
+            f"{keys_text}\n"
             f"Generated: {now.strftime('%Y-%m-%d %H:%M:%S')}"
         )
 
-        await message.reply_text(stats_text, parse_mode="html")
+        await message.reply_text(stats_text, parse_mode=ParseMode.HTML)
 
     except Exception as e:
         logger.error(f"Error in detailed stats: {str(e)}")
@@ -9,7 +9,7 @@ import logging
 logger = logging.getLogger(__name__)
 
 @admin_only
-@rate_limit
+@rate_limit(command_class="broadcast")
 async def broadcast_command(client: Client, message: Message) -> None:
     """Handle the /broadcast command."""
     try:
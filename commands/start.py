@@ -11,7 +11,7 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-@rate_limit
+@rate_limit(command_class="command")
 async def start_command(client: Client, message: Message) -> None:
     """Handle the /start command."""
     try:
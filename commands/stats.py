@@ -8,7 +8,7 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-@rate_limit
+@rate_limit(command_class="command")
 async def usage_stats(client: Client, message: Message) -> None:
     """Handle the /stats command."""
     try:
@@ -2,6 +2,8 @@ from pyrogram import Client
 from pyrogram.types import Message
 from utils.decorators import admin_only
 from database.mongodb import db
+from database.change_watcher import bump_cache_version
+from database.ban_list import ban_list
 from datetime import datetime
 import logging
 
@@ -50,6 +52,8 @@ async def ban_user(client: Client, message: Message) -> None:
                 }
             }
         )
+        ban_list.add(user_id)
+        await bump_cache_version("users")
 
         # Log ban
         logger.info(f"User {user_id} banned by {message.from_user.id}. Reason: {reason}")
@@ -103,6 +107,8 @@ async def unban_user(client: Client, message: Message) -> None:
                 }
             }
         )
+        ban_list.discard(user_id)
+        await bump_cache_version("users")
 
         # Log unban
         logger.info(f"User {user_id} unbanned by {message.from_user.id}")
@@ -10,6 +10,13 @@ API_ID = os.getenv("API_ID")
 API_HASH = os.getenv("API_HASH")
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 TINIFY_API_KEY = os.getenv("TINIFY_API_KEY")
+# Extra operator keys (comma separated) pooled with TINIFY_API_KEY
+TINIFY_API_KEYS = list(dict.fromkeys(
+    key.strip()
+    for key in [TINIFY_API_KEY or ""] + os.getenv("TINIFY_API_KEYS", "").split(",")
+    if key.strip()
+))
+TINIFY_MONTHLY_LIMIT = int(os.getenv("TINIFY_MONTHLY_LIMIT", 500))  # Free plan quota per key
 MONGO_URI = os.getenv("MONGO_URI")
 ADMIN_ID = int(os.getenv("ADMIN_ID"))
 LOG_CHANNEL_ID = int(os.getenv("LOG_CHANNEL_ID"))
@@ -22,11 +29,91 @@ if not LOG_CHANNEL_ID:
 # File Configuration
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
 SUPPORTED_FORMATS = {'.jpg', '.jpeg', '.png'}
+SNIFF_BYTES = 4096  # Leading bytes checked for image magic numbers
+TEMP_FILE_MIN_AGE_MINUTES = int(os.getenv("TEMP_FILE_MIN_AGE_MINUTES", 30))  # Cleanup skips files written more recently
+
+# Albums
+MEDIA_GROUP_WINDOW_SECONDS = float(os.getenv("MEDIA_GROUP_WINDOW_SECONDS", 1.5))  # Wait for the rest of an album
+ALBUM_REPLY_FORMAT = os.getenv("ALBUM_REPLY_FORMAT", "media_group")  # "media_group" or "zip"
+
+# ZIP archives
+ARCHIVE_MAX_SIZE = int(os.getenv("ARCHIVE_MAX_SIZE", 50 * 1024 * 1024))  # 50MB
+ARCHIVE_MAX_MEMBERS = int(os.getenv("ARCHIVE_MAX_MEMBERS", 500))  # Images compressed per archive
+ARCHIVE_WORKERS = int(os.getenv("ARCHIVE_WORKERS", 4))  # Members compressed at once per archive
+
+# URL Downloads
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", 8))
+HTTP_DNS_CACHE_SECONDS = int(os.getenv("HTTP_DNS_CACHE_SECONDS", 300))
+HTTP_TIMEOUT_SECONDS = int(os.getenv("HTTP_TIMEOUT_SECONDS", 30))
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Compression Executor
+COMPRESSION_WORKERS = int(os.getenv("COMPRESSION_WORKERS", 4))
+
+# Processing Pipeline (concurrent jobs per stage)
+PIPELINE_FETCH_WORKERS = int(os.getenv("PIPELINE_FETCH_WORKERS", 16))
+PIPELINE_PROBE_WORKERS = int(os.getenv("PIPELINE_PROBE_WORKERS", 4))
+PIPELINE_COMPRESS_WORKERS = int(os.getenv("PIPELINE_COMPRESS_WORKERS", COMPRESSION_WORKERS))
+PIPELINE_DELIVER_WORKERS = int(os.getenv("PIPELINE_DELIVER_WORKERS", 8))
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", 32))
+PIPELINE_MAX_IN_FLIGHT = int(os.getenv("PIPELINE_MAX_IN_FLIGHT", 0))  # Jobs past the fair queue at once, 0 for one per stage worker
+SCHEDULER_PRIORITY_WEIGHT = int(os.getenv("SCHEDULER_PRIORITY_WEIGHT", 3))  # Share for custom-key users
+
+# Compression Backends ("tinify" or "local")
+COMPRESSION_BACKEND = os.getenv("COMPRESSION_BACKEND", "tinify")
+COMPRESSION_FALLBACK_BACKEND = os.getenv("COMPRESSION_FALLBACK_BACKEND", "local")  # Empty to disable
+LOCAL_COMPRESSION_WORKERS = int(os.getenv("LOCAL_COMPRESSION_WORKERS", os.cpu_count() or 1))
+LOCAL_JPEG_QUALITY = int(os.getenv("LOCAL_JPEG_QUALITY", 80))
+
+# Compression Result Cache
+COMPRESSION_CACHE_DIR = os.getenv("COMPRESSION_CACHE_DIR", "cache")
+COMPRESSION_CACHE_MAX_BYTES = int(os.getenv("COMPRESSION_CACHE_MAX_BYTES", 256 * 1024 * 1024))  # 256MB
+
+# Telegram file reuse index
+FILE_INDEX_HOT_SIZE = int(os.getenv("FILE_INDEX_HOT_SIZE", 10000))
+
+# Per-user API key and settings cache
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+USER_CACHE_TTL_SECONDS = int(os.getenv("USER_CACHE_TTL_SECONDS", 300))
+USER_CACHE_NEGATIVE_TTL_SECONDS = int(os.getenv("USER_CACHE_NEGATIVE_TTL_SECONDS", 60))  # Users without a record
+CACHE_SYNC_POLL_SECONDS = int(os.getenv("CACHE_SYNC_POLL_SECONDS", 30))  # When change streams are unavailable
+
+# Bulk URL messages
+BULK_URL_MAX = int(os.getenv("BULK_URL_MAX", 50))  # Links accepted per message or .txt file
+BULK_URL_CONCURRENCY = int(os.getenv("BULK_URL_CONCURRENCY", 4))  # Links in the pipeline at once per batch
+BULK_URL_FILE_MAX_SIZE = 256 * 1024  # 256KB of links
+
+# URL result cache, revalidated with ETag / Last-Modified
+URL_CACHE_TTL_HOURS = int(os.getenv("URL_CACHE_TTL_HOURS", 72))
+URL_CACHE_MAX_ENTRIES = int(os.getenv("URL_CACHE_MAX_ENTRIES", 50000))
 
 # Rate Limiting
 RATE_LIMIT_SECONDS = 5
-USER_DATA_EXPIRY_HOURS = 24
-RATE_LIMIT_CLEANUP_HOURS = 1
+# Token buckets per command class: (burst, seconds to earn one token back)
+RATE_LIMITS = {
+    "default": (1, RATE_LIMIT_SECONDS),
+    "command": (3, RATE_LIMIT_SECONDS),
+    "url": (2, RATE_LIMIT_SECONDS),
+    "broadcast": (1, 60)
+}
+# Share buckets through MongoDB when several bot instances run side by side
+DISTRIBUTED_RATE_LIMIT = os.getenv("DISTRIBUTED_RATE_LIMIT", "false").lower() == "true"
+RATE_LIMIT_LEASE_SIZE = int(os.getenv("RATE_LIMIT_LEASE_SIZE", 3))  # Shared tokens taken per MongoDB round-trip
+USER_DATA_EXPIRY_HOURS = 24  # Log retention, enforced by MongoDB TTL
+USAGE_STATS_RETENTION_DAYS = int(os.getenv("USAGE_STATS_RETENTION_DAYS", 35))  # Daily usage documents
+
+# Daily quotas per user, 0 disables a limit
+DAILY_QUOTA_COUNT = int(os.getenv("DAILY_QUOTA_COUNT", 50))  # Images per day on the shared keys
+DAILY_QUOTA_BYTES = int(os.getenv("DAILY_QUOTA_BYTES", 100 * 1024 * 1024))  # 100MB of input per day
+CUSTOM_KEY_DAILY_QUOTA_COUNT = int(os.getenv("CUSTOM_KEY_DAILY_QUOTA_COUNT", 500))  # With their own API key
+CUSTOM_KEY_DAILY_QUOTA_BYTES = int(os.getenv("CUSTOM_KEY_DAILY_QUOTA_BYTES", 1024 * 1024 * 1024))  # 1GB
+QUOTA_RECONCILE_MINUTES = int(os.getenv("QUOTA_RECONCILE_MINUTES", 5))
+
+# Write-behind statistics
+STATS_FLUSH_SECONDS = int(os.getenv("STATS_FLUSH_SECONDS", 10))  # Longest time an increment waits in memory
+STATS_FLUSH_MAX_PENDING = int(os.getenv("STATS_FLUSH_MAX_PENDING", 1000))  # Flush early past this many pending writes
+STATS_MAX_BUFFERED_LOGS = int(os.getenv("STATS_MAX_BUFFERED_LOGS", 10000))  # Oldest API logs are dropped past this during outages
 
 # Error Messages
 ERROR_MESSAGES = {
@@ -35,6 +122,8 @@ ERROR_MESSAGES = {
     "invalid_format": "⚠️ Unsupported file format. Supported formats: JPEG, PNG",
     "invalid_image": "⚠️ Invalid image file.",
     "invalid_url": "⚠️ Invalid URL format. Please send a valid image URL.",
+    "quota_exceeded": "⚠️ Daily limit reached! Add your own TinyPNG API key for a higher limit or try again tomorrow.",
+    "custom_quota_exceeded": "⚠️ Daily limit reached! Please try again tomorrow.",
     "general_error": "❌ An error occurred while processing your request."
 }
   
\ No newline at end of file
@@ -1,6 +1,9 @@
 from typing import Optional, Dict, Any
 from datetime import datetime, timedelta
 from .mongodb import db
+from .stats_writer import stats_writer
+from .user_cache import api_key_cache
+from .change_watcher import bump_cache_version
 import logging
 
 logger = logging.getLogger(__name__)
@@ -62,43 +65,33 @@ async def save_api_key(user_id: int, api_key: str) -> bool:
             },
             upsert=True
         )
+        api_key_cache.invalidate(user_id)
+        await bump_cache_version("api_keys")
         return True
     except Exception as e:
         logger.error(f"Error saving API key: {str(e)}")
         return False
 
 async def get_user_api_key(user_id: int) -> Optional[str]:
-    """Get user's API key."""
-    try:
+    """Get user's API key, cached including the absence of one."""
+    async def load() -> Optional[str]:
         doc = await db.api_keys.find_one({"user_id": user_id})
         return doc["api_key"] if doc else None
+
+    try:
+        return await api_key_cache.get_or_load(user_id, load)
     except Exception as e:
         logger.error(f"Error getting API key: {str(e)}")
         return None
 
 async def save_api_log(log_data: Dict[str, Any]) -> bool:
-    """Save API call log."""
+    """Queue an API call log; it is written with the next stats flush."""
     try:
         # Add timestamp if not present
         if "timestamp" not in log_data:
             log_data["timestamp"] = datetime.now()
-            
-        await db.api_logs.insert_one(log_data)
-        
-        # Update user's total stats
-        await db.api_stats.update_one(
-            {"user_id": log_data["user_id"]},
-            {
-                "$inc": {
-                    "total_calls": 1,
-                    "total_size": log_data.get("size", 0)
-                },
-                "$set": {
-                    "last_used": log_data["timestamp"]
-                }
-            },
-            upsert=True
-        )
+
+        stats_writer.add_api_log(log_data)
         return True
     except Exception as e:
         logger.error(f"Error saving API log: {str(e)}")
@@ -116,6 +109,8 @@ async def remove_api_key(user_id: int) -> bool:
     """
     try:
         result = await db.api_keys.delete_one({"user_id": user_id})
+        api_key_cache.invalidate(user_id)
+        await bump_cache_version("api_keys")
         return bool(result.deleted_count)
     except Exception as e:
         logger.error(f"Error removing API key: {str(e)}")
@@ -0,0 +1,52 @@
+from typing import Any, Dict, Optional, Set
+from .mongodb import db
+from .change_watcher import change_watcher
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class BanList:
+    """
+    In-memory set of banned user IDs.
+
+    Loaded once at startup and kept in sync by the ban commands and the
+    users change stream, so checking an update is a set lookup.
+    """
+
+    def __init__(self):
+        self._banned: Set[int] = set()
+
+    async def load(self) -> None:
+        """Load every banned user through the partial ``banned`` index."""
+        try:
+            cursor = db.users.find({"banned": True}, {"user_id": 1, "_id": 0})
+            self._banned = {doc["user_id"] async for doc in cursor}
+            logger.info(f"Loaded {len(self._banned)} banned users")
+        except Exception as e:
+            logger.error(f"Error loading banned users: {str(e)}")
+
+    def add(self, user_id: int) -> None:
+        self._banned.add(user_id)
+
+    def discard(self, user_id: int) -> None:
+        self._banned.discard(user_id)
+
+    def on_change(self, user_id: Optional[int], document: Optional[Dict[str, Any]]) -> None:
+        """Apply a users change from another instance."""
+        if user_id is None:
+            asyncio.ensure_future(self.load())
+        elif document and document.get("banned"):
+            self.add(user_id)
+        else:
+            self.discard(user_id)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._banned
+
+    def __len__(self) -> int:
+        return len(self._banned)
+
+# Shared ban list checked before any handler runs
+ban_list = BanList()
+change_watcher.subscribe("users", ban_list.on_change)
@@ -0,0 +1,144 @@
+from typing import Any, Callable, Dict, List, Optional
+from pymongo.errors import OperationFailure, PyMongoError
+from .mongodb import db
+from config import CACHE_SYNC_POLL_SECONDS
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Called with (user_id, document); user_id None means "anything may have changed"
+ChangeCallback = Callable[[Optional[int], Optional[Dict[str, Any]]], None]
+
+# Only the changes caches care about, so stats writes to users don't wake us
+WATCH_PIPELINES = {
+    "api_keys": [],
+    "settings": [],
+    "users": [{"$match": {"$or": [
+        {"operationType": {"$in": ["insert", "replace", "delete"]}},
+        {"updateDescription.updatedFields.banned": {"$exists": True}}
+    ]}}]
+}
+
+# Server error codes: change streams need a replica set / resume point is gone
+CHANGE_STREAMS_UNSUPPORTED = (40573, 40324)
+CHANGE_STREAM_HISTORY_LOST = 286
+
+async def bump_cache_version(collection_name: str) -> None:
+    """Record a write for instances that poll instead of watching."""
+    try:
+        await db.cache_versions.update_one(
+            {"_id": collection_name},
+            {"$inc": {"version": 1}},
+            upsert=True
+        )
+    except Exception as e:
+        logger.error(f"Error bumping cache version for {collection_name}: {str(e)}")
+
+class ChangeWatcher:
+    """
+    Keeps in-process caches coherent with writes made by other instances.
+
+    Each watched collection gets a change stream that resumes from its last
+    token after a dropped connection. Without a replica set, it falls back
+    to polling a per-collection version counter and flushes the subscribers
+    whenever the counter moves.
+    """
+
+    def __init__(self, poll_seconds: int = CACHE_SYNC_POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self._subscribers: Dict[str, List[ChangeCallback]] = {}
+        self._resume_tokens: Dict[str, Any] = {}
+        self._tasks: List[asyncio.Task] = []
+        self.events = 0
+        self.polling = False
+
+    def subscribe(self, collection_name: str, callback: ChangeCallback) -> None:
+        """Call ``callback`` whenever a document of the collection changes."""
+        self._subscribers.setdefault(collection_name, []).append(callback)
+
+    def start(self) -> None:
+        """Start one watcher task per subscribed collection."""
+        self._tasks = [
+            asyncio.ensure_future(self._watch(name))
+            for name in self._subscribers
+        ]
+
+    async def stop(self) -> None:
+        """Cancel the watcher tasks."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _watch(self, name: str) -> None:
+        backoff = 1
+        while True:
+            try:
+                async with db[name].watch(
+                    WATCH_PIPELINES.get(name, []),
+                    full_document="updateLookup",
+                    resume_after=self._resume_tokens.get(name)
+                ) as stream:
+                    logger.info(f"Watching {name} for cache invalidations")
+                    backoff = 1
+                    async for change in stream:
+                        self._resume_tokens[name] = stream.resume_token
+                        self._dispatch(name, change)
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAMS_UNSUPPORTED:
+                    logger.warning(f"Change streams unavailable, polling {name} instead")
+                    self.polling = True
+                    await self._poll(name)
+                    return
+                if e.code == CHANGE_STREAM_HISTORY_LOST:
+                    # Changes were missed, start over from an empty cache
+                    self._resume_tokens.pop(name, None)
+                    self._notify(name, None, None)
+                logger.error(f"Change stream on {name} failed: {str(e)}")
+            except PyMongoError as e:
+                logger.error(f"Change stream on {name} disconnected: {str(e)}")
+
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 60)
+
+    async def _poll(self, name: str) -> None:
+        last_version = None
+        while True:
+            try:
+                doc = await db.cache_versions.find_one({"_id": name})
+                version = doc["version"] if doc else 0
+                if last_version is not None and version != last_version:
+                    self._notify(name, None, None)
+                last_version = version
+            except Exception as e:
+                logger.error(f"Error polling cache version for {name}: {str(e)}")
+            await asyncio.sleep(self.poll_seconds)
+
+    def _dispatch(self, name: str, change: Dict[str, Any]) -> None:
+        self.events += 1
+        document = change.get("fullDocument")
+        # Deletes only carry the _id, so the affected user is unknown
+        user_id = document.get("user_id") if document else None
+        self._notify(name, user_id, document)
+
+    def _notify(self, name: str, user_id: Optional[int], document: Optional[Dict[str, Any]]) -> None:
+        for callback in self._subscribers.get(name, []):
+            try:
+                callback(user_id, document)
+            except Exception as e:
+                logger.error(f"Cache invalidation for {name} failed: {str(e)}")
+
+def invalidate_cache(cache) -> ChangeCallback:
+    """Subscriber dropping the changed user's entry, or everything if unknown."""
+    def callback(user_id: Optional[int], document: Optional[Dict[str, Any]]) -> None:
+        if user_id is None:
+            cache.clear()
+        else:
+            cache.invalidate(user_id)
+    return callback
+
+# Shared watcher so each collection is only watched once per process
+change_watcher = ChangeWatcher()
@@ -0,0 +1,80 @@
+from typing import Optional, Dict, Any
+from datetime import datetime
+from .mongodb import db
+from utils.cache import LRUCache
+from config import FILE_INDEX_HOT_SIZE
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Hot layer in front of the compressed_files collection
+_hot_index = LRUCache(FILE_INDEX_HOT_SIZE)
+
+async def get_compressed_file(file_unique_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Look up a previously delivered compressed file.
+
+    Args:
+        file_unique_id (str): Telegram file_unique_id of the incoming file.
+
+    Returns:
+        Optional[Dict[str, Any]]: file_id and sizes of the compressed document, if known.
+    """
+    entry = _hot_index.get(file_unique_id)
+    if entry:
+        return entry
+
+    try:
+        doc = await db.compressed_files.find_one({"file_unique_id": file_unique_id})
+        if not doc:
+            return None
+
+        entry = {
+            "file_id": doc["file_id"],
+            "original_size": doc.get("original_size", 0),
+            "compressed_size": doc.get("compressed_size", 0)
+        }
+        _hot_index.set(file_unique_id, entry)
+        return entry
+    except Exception as e:
+        logger.error(f"Error getting compressed file {file_unique_id}: {str(e)}")
+        return None
+
+async def save_compressed_file(
+    file_unique_id: str,
+    file_id: str,
+    original_size: int,
+    compressed_size: int
+) -> bool:
+    """
+    Remember the compressed document sent for an incoming file.
+
+    Args:
+        file_unique_id (str): Telegram file_unique_id of the incoming file.
+        file_id (str): file_id of the compressed document we sent.
+        original_size (int): Size of the incoming file.
+        compressed_size (int): Size of the compressed document.
+
+    Returns:
+        bool: True if successful, False otherwise.
+    """
+    entry = {
+        "file_id": file_id,
+        "original_size": original_size,
+        "compressed_size": compressed_size
+    }
+    _hot_index.set(file_unique_id, entry)
+
+    try:
+        await db.compressed_files.update_one(
+            {"file_unique_id": file_unique_id},
+            {
+                "$set": {**entry, "updated_at": datetime.utcnow()},
+                "$setOnInsert": {"created_at": datetime.utcnow()}
+            },
+            upsert=True
+        )
+        return True
+    except Exception as e:
+        logger.error(f"Error saving compressed file {file_unique_id}: {str(e)}")
+        return False
@@ -1,53 +1,231 @@
-from motor.motor_asyncio import AsyncIOMotorClient
-from typing import Optional, Dict, Any
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from typing import Optional, Dict, Any, List, Tuple
 import logging
-from config import MONGO_URI
+from pymongo import IndexModel
+from pymongo.errors import CollectionInvalid, OperationFailure
+from config import MONGO_URI, URL_CACHE_TTL_HOURS, USER_DATA_EXPIRY_HOURS, USAGE_STATS_RETENTION_DAYS
 import asyncio
+import time
 
 logger = logging.getLogger(__name__)
 
+DATABASE_NAME = "image_compressor"
+
+# Collections, also reachable as attributes (mongodb.users, db.users, ...)
+COLLECTIONS = (
+    "users",
+    "api_keys",
+    "usage_stats",
+    "settings",
+    "logs",
+    "user_logs",
+    "api_logs",
+    "api_stats",
+    "compressed_files",
+    "stats_rollups",
+    "cache_versions",
+    "url_cache",
+    "rate_limits"
+)
+
+# (collection, keys, options) for every index the bot relies on
+INDEXES: List[Tuple[str, List[Tuple[str, int]], Dict[str, Any]]] = [
+    ("users", [("user_id", 1)], {"unique": True}),
+    # Only banned users are indexed, for loading the ban list
+    ("users", [("banned", 1)], {"partialFilterExpression": {"banned": True}}),
+    ("api_keys", [("user_id", 1)], {"unique": True}),
+    ("usage_stats", [("user_id", 1), ("date", 1)], {}),
+    ("usage_stats", [("day", 1)], {"expireAfterSeconds": USAGE_STATS_RETENTION_DAYS * 86400}),
+    ("user_logs", [("user_id", 1), ("timestamp", 1)], {}),
+    ("api_stats", [("user_id", 1), ("date", 1)], {}),
+    ("compressed_files", [("file_unique_id", 1)], {"unique": True}),
+    ("rate_limits", [("expires_at", 1)], {"expireAfterSeconds": 0}),
+    ("url_cache", [("url", 1)], {"unique": True}),
+    ("url_cache", [("last_used_at", 1)], {"expireAfterSeconds": URL_CACHE_TTL_HOURS * 3600})
+]
+
+# Log collections stored as time series: (name, metaField)
+TIME_SERIES_COLLECTIONS = (
+    ("logs", None),
+    ("api_logs", "user_id"),
+    ("user_logs", "user_id")
+)
+
+# Server error code for an index that exists with other options
+INDEX_OPTIONS_CONFLICT = 85
+# Server error code for creating a collection that already exists
+NAMESPACE_EXISTS = 48
+
 class MongoDB:
     """
     MongoDB client for the Image Compressor Bot.
     Manages connections and provides access to collections.
+
+    The Motor client is created on first use, inside the running event
+    loop, so importing this module never touches the network. Pass a
+    client (or call ``set_client``) to use another server or a test double.
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        client: Optional[AsyncIOMotorClient] = None,
+        uri: Optional[str] = MONGO_URI,
+        database_name: str = DATABASE_NAME
+    ):
+        self._client = client
+        self.uri = uri
+        self.database_name = database_name
+
+    @property
+    def client(self) -> AsyncIOMotorClient:
+        """The Motor client, created on first access."""
+        if self._client is None:
+            # Motor connects in the background, this does not block
+            self._client = AsyncIOMotorClient(self.uri, serverSelectionTimeoutMS=5000)
+        return self._client
+
+    @property
+    def db(self) -> AsyncIOMotorDatabase:
+        """The bot's database."""
+        return self.client[self.database_name]
+
+    def set_client(self, client: AsyncIOMotorClient) -> None:
+        """Replace the client, e.g. with one pointing at a test server."""
+        self._client = client
+
+    def __getattr__(self, name: str):
+        if name in COLLECTIONS:
+            return self.db[name]
+        raise AttributeError(name)
+
+    async def connect(self) -> None:
+        """Verify the connection and log how long the first round-trip took."""
+        started = time.monotonic()
         try:
-            self.client = AsyncIOMotorClient(MONGO_URI, serverSelectionTimeoutMS=5000)
-            self.db = self.client.image_compressor
-            
-            # Collections
-            self.users = self.db.users
-            self.api_keys = self.db.api_keys
-            self.usage_stats = self.db.usage_stats
-            self.settings = self.db.settings
-            self.logs = self.db.logs
-            self.user_logs = self.db.user_logs
-            self.api_stats = self.db.api_stats
-            
-            # Verify connection
-            asyncio.get_event_loop().run_until_complete(self.client.server_info())
-            logger.info("Successfully connected to MongoDB")
-            
+            await self.client.admin.command("ping")
+            logger.info(f"Successfully connected to MongoDB in {time.monotonic() - started:.2f}s")
         except Exception as e:
             logger.error(f"Failed to connect to MongoDB: {str(e)}")
             raise
 
     async def init_indexes(self):
-        """Initialize database indexes."""
+        """
+        Initialize database indexes.
+
+        Existing indexes are listed once per collection and skipped, and the
+        collections are handled concurrently.
+        """
+        started = time.monotonic()
         try:
-            await self.users.create_index("user_id", unique=True, background=True)
-            await self.api_keys.create_index("user_id", unique=True, background=True)
-            await self.usage_stats.create_index([("user_id", 1), ("date", 1)], background=True)
-            await self.logs.create_index("timestamp", background=True)
-            await self.user_logs.create_index([("user_id", 1), ("timestamp", 1)], background=True)
-            await self.api_stats.create_index([("user_id", 1), ("date", 1)], background=True)
-            logger.info("All indexes created successfully.")
+            await self.init_time_series()
+
+            by_collection: Dict[str, list] = {}
+            for name, keys, options in INDEXES:
+                by_collection.setdefault(name, []).append((keys, options))
+            created = await asyncio.gather(*(
+                self._ensure_indexes(name, specs)
+                for name, specs in by_collection.items()
+            ))
+
+            logger.info(
+                f"Indexes ready in {time.monotonic() - started:.2f}s "
+                f"({sum(created)} created)"
+            )
         except Exception as e:
             logger.error(f"Error creating indexes: {str(e)}")
             raise
 
-# Initialize MongoDB instance
+    async def _ensure_indexes(self, name: str, specs: list) -> int:
+        """Create the missing indexes of one collection and sync TTL values."""
+        collection = self.db[name]
+        existing = await collection.index_information()
+
+        missing = []
+        for keys, options in specs:
+            index_name = "_".join(f"{field}_{direction}" for field, direction in keys)
+            current = existing.get(index_name)
+            if current is None:
+                missing.append(IndexModel(keys, name=index_name, **options))
+            elif "expireAfterSeconds" in options and current.get("expireAfterSeconds") != options["expireAfterSeconds"]:
+                await self._set_ttl(name, dict(keys), options["expireAfterSeconds"])
+
+        if missing:
+            await collection.create_indexes(missing)
+        return len(missing)
+
+    async def init_time_series(self):
+        """
+        Create the log collections as expiring time series.
+
+        Collections that already exist as regular ones can't be converted,
+        so they get a TTL index on ``timestamp`` instead. Either way MongoDB
+        drops old entries itself.
+        """
+        existing = set(await self.db.list_collection_names())
+        await asyncio.gather(*(
+            self._init_time_series_collection(name, meta_field, name in existing)
+            for name, meta_field in TIME_SERIES_COLLECTIONS
+        ))
+
+        # usage_stats is upserted per day, so it stays a regular collection
+        # with a date-typed copy of its "date" string for the TTL index
+        await self.db.usage_stats.update_many(
+            {"day": {"$exists": False}},
+            [{"$set": {"day": {"$dateFromString": {"dateString": "$date", "format": "%Y-%m-%d"}}}}]
+        )
+
+    async def _init_time_series_collection(self, name: str, meta_field: Optional[str], exists: bool):
+        expire_after = USER_DATA_EXPIRY_HOURS * 3600
+        if not exists:
+            timeseries = {"timeField": "timestamp", "granularity": "minutes"}
+            if meta_field:
+                timeseries["metaField"] = meta_field
+            try:
+                await self.db.create_collection(name, timeseries=timeseries, expireAfterSeconds=expire_after)
+                logger.info(f"Created time series collection {name}")
+                return
+            except CollectionInvalid:
+                # Another instance booting at the same time created it first
+                pass
+            except OperationFailure as e:
+                if e.code != NAMESPACE_EXISTS:
+                    raise
+
+        options = await self.db[name].options()
+        if "timeseries" in options:
+            if options.get("expireAfterSeconds") != expire_after:
+                await self.db.command("collMod", name, expireAfterSeconds=expire_after)
+        else:
+            await self.ensure_ttl_index(self.db[name], "timestamp", expire_after)
+
+    async def ensure_ttl_index(self, collection, field: str, expire_after: int):
+        """Create a TTL index, or update the expiry of an existing index on the field."""
+        try:
+            await collection.create_index(field, expireAfterSeconds=expire_after, background=True)
+        except OperationFailure as e:
+            if e.code != INDEX_OPTIONS_CONFLICT:
+                raise
+            await self._set_ttl(collection.name, {field: 1}, expire_after)
+
+    async def _set_ttl(self, name: str, key_pattern: Dict[str, int], expire_after: int):
+        await self.db.command(
+            "collMod",
+            name,
+            index={"keyPattern": key_pattern, "expireAfterSeconds": expire_after}
+        )
+
+class _LazyDatabase:
+    """Stand-in for the Motor database that resolves it on first use."""
+
+    def __init__(self, owner: MongoDB):
+        self._owner = owner
+
+    def __getattr__(self, name: str):
+        return getattr(self._owner.db, name)
+
+    def __getitem__(self, name: str):
+        return self._owner.db[name]
+
+# Initialize MongoDB instance; no connection is made until it is used
 mongodb = MongoDB()
-db = mongodb.db
\ No newline at end of file
+db = _LazyDatabase(mongodb)
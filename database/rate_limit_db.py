@@ -0,0 +1,70 @@
+from typing import Tuple
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from .mongodb import db
+import logging
+
+logger = logging.getLogger(__name__)
+
+async def take_token(
+    user_id: int,
+    command_class: str,
+    burst: int,
+    refill_seconds: float,
+    count: int = 1
+) -> Tuple[int, float]:
+    """
+    Atomically take up to ``count`` tokens from a user's shared bucket.
+
+    Buckets are stored as a GCRA "theoretical arrival time": each token
+    pushes ``tat`` forward by one refill period and is allowed while ``tat``
+    stays within ``burst`` periods of now. The filter only matches buckets
+    with room for at least one token, so a full bucket turns the upsert into
+    a duplicate key error instead of a second document.
+
+    Args:
+        user_id (int): The Telegram user ID.
+        command_class (str): Key into ``RATE_LIMITS``.
+        burst (int): Requests allowed back to back.
+        refill_seconds (float): Seconds to earn one token back.
+        count (int): Most tokens to take; fewer are granted if fewer are left.
+
+    Returns:
+        Tuple[int, float]: Tokens granted, and seconds until the next token
+        if none were.
+    """
+    key = f"{user_id}:{command_class}"
+    now = datetime.utcnow()
+    period = timedelta(seconds=refill_seconds)
+    period_ms = refill_seconds * 1000
+    latest_allowed = now + period * (burst - 1)
+
+    try:
+        doc = await db.rate_limits.find_one_and_update(
+            {"_id": key, "tat": {"$not": {"$gt": latest_allowed}}},
+            [
+                {"$set": {"start": {"$max": ["$tat", now]}}},
+                # Tokens left, the filter guarantees at least one
+                {"$set": {"granted": {"$min": [
+                    count,
+                    {"$add": [1, {"$floor": {"$divide": [
+                        {"$subtract": [latest_allowed, "$start"]},
+                        period_ms
+                    ]}}]}
+                ]}}},
+                {"$set": {"tat": {"$add": ["$start", {"$multiply": ["$granted", period_ms]}]}}},
+                # Once tat has passed the bucket is full and the document can go
+                {"$set": {"expires_at": "$tat"}},
+                {"$unset": "start"}
+            ],
+            projection={"granted": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return int(doc["granted"]), 0.0
+    except DuplicateKeyError:
+        doc = await db.rate_limits.find_one({"_id": key}, {"tat": 1})
+        if not doc:
+            return 1, 0.0
+        return 0, max(0.0, (doc["tat"] - latest_allowed).total_seconds())
@@ -0,0 +1,123 @@
+from typing import Any, Dict, List
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from .mongodb import db
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Counters kept in every rollup document
+ROLLUP_FIELDS = ("new_users", "compressions", "original_size", "size_saved")
+
+# Marker claimed by the one instance that seeds the rollups
+SEED_MARKER_ID = "seed"
+# An unfinished claim older than this is taken over on the next start
+SEED_CLAIM_TIMEOUT = timedelta(minutes=10)
+
+def rollup_ids(when: datetime) -> List[str]:
+    """Ids of the daily, monthly and all-time rollups an event at ``when`` counts towards."""
+    return [f"day:{when.strftime('%Y-%m-%d')}", f"month:{when.strftime('%Y-%m')}", "total"]
+
+async def get_dashboard_rollups(now: datetime) -> Dict[str, Dict[str, int]]:
+    """
+    Read the rollups shown on the admin dashboard in one query.
+
+    Args:
+        now (datetime): Current UTC time.
+
+    Returns:
+        Dict[str, Dict[str, int]]: Counters for today, yesterday, this_month and total.
+    """
+    periods = {
+        "today": f"day:{now.strftime('%Y-%m-%d')}",
+        "yesterday": f"day:{(now - timedelta(days=1)).strftime('%Y-%m-%d')}",
+        "this_month": f"month:{now.strftime('%Y-%m')}",
+        "total": "total"
+    }
+    docs = {
+        doc["_id"]: doc
+        async for doc in db.stats_rollups.find({"_id": {"$in": list(periods.values())}})
+    }
+    return {
+        period: {field: docs.get(rollup_id, {}).get(field, 0) for field in ROLLUP_FIELDS}
+        for period, rollup_id in periods.items()
+    }
+
+async def seed_rollups() -> None:
+    """
+    Build the rollups from users and usage_stats once, on first start.
+
+    Later changes are added incrementally by ``stats_writer``. Instances
+    starting together race for a marker document, so only one seeds.
+    """
+    try:
+        marker = await db.stats_rollups.find_one({"_id": SEED_MARKER_ID})
+        if marker is None and await db.stats_rollups.find_one({"_id": "total"}):
+            # Seeded before the marker existed
+            return
+        if not await _claim_seed():
+            return
+
+        rollups: Dict[str, Dict[str, Any]] = {}
+
+        def add(when: datetime, counts: Dict[str, int]) -> None:
+            for rollup_id in rollup_ids(when):
+                rollup = rollups.setdefault(rollup_id, {field: 0 for field in ROLLUP_FIELDS})
+                for field, value in counts.items():
+                    rollup[field] += value
+
+        async for doc in db.users.aggregate([
+            {"$match": {"joined_date": {"$type": "date"}}},
+            {"$group": {
+                "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$joined_date"}},
+                "new_users": {"$sum": 1}
+            }}
+        ]):
+            add(datetime.strptime(doc["_id"], "%Y-%m-%d"), {"new_users": doc["new_users"]})
+
+        async for doc in db.usage_stats.aggregate([
+            {"$group": {
+                "_id": "$date",
+                "compressions": {"$sum": "$compressions"},
+                "original_size": {"$sum": "$original_size"},
+                "size_saved": {"$sum": "$size_saved"}
+            }}
+        ]):
+            if doc["_id"]:
+                add(datetime.strptime(doc["_id"], "%Y-%m-%d"), {
+                    field: doc[field] for field in ("compressions", "original_size", "size_saved")
+                })
+
+        # Users from before joined_date was recorded still count towards the total
+        rollups.setdefault("total", {field: 0 for field in ROLLUP_FIELDS})
+        rollups["total"]["new_users"] = await db.users.count_documents({})
+
+        # $set, so a seed retried after a partial failure overwrites instead of adding up
+        await db.stats_rollups.bulk_write([
+            UpdateOne({"_id": rollup_id}, {"$set": counts}, upsert=True)
+            for rollup_id, counts in rollups.items()
+        ], ordered=False)
+        await db.stats_rollups.update_one({"_id": SEED_MARKER_ID}, {"$set": {"done": True}})
+        logger.info(f"Seeded {len(rollups)} stats rollups")
+    except Exception as e:
+        # The claim expires, so a later start finishes the seed
+        logger.error(f"Error seeding stats rollups: {str(e)}")
+
+async def _claim_seed() -> bool:
+    """Take the seed marker unless it's done or held by a live instance."""
+    now = datetime.utcnow()
+    try:
+        await db.stats_rollups.update_one(
+            {
+                "_id": SEED_MARKER_ID,
+                "done": False,
+                "claimed_at": {"$lt": now - SEED_CLAIM_TIMEOUT}
+            },
+            {"$set": {"claimed_at": now}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        # The marker exists but didn't match: done, or another instance is seeding
+        return False
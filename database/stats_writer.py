@@ -0,0 +1,276 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from collections import defaultdict, deque
+from datetime import datetime
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from .mongodb import db
+from .stats_db import rollup_ids
+from config import STATS_FLUSH_MAX_PENDING, STATS_MAX_BUFFERED_LOGS
+import asyncio
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+class StatsWriter:
+    """
+    Write-behind buffer for per-compression statistics.
+
+    Increments are merged in memory per user and per user/day and written
+    with one unordered ``bulk_write`` per collection on every flush, so
+    callers never wait on MongoDB. A batch that fails as a whole is merged
+    back into the buffer for the next flush. At most ``STATS_FLUSH_SECONDS``
+    worth of increments are lost if the process dies without a final flush.
+    """
+
+    def __init__(self, max_pending: int = STATS_FLUSH_MAX_PENDING, max_logs: int = STATS_MAX_BUFFERED_LOGS):
+        self.max_pending = max_pending
+        self.max_logs = max_logs
+        self.dropped_logs = 0
+        self._reset()
+        self._flush_task = None
+        self.flushes = 0
+        self.written = 0
+        self.last_flush_size = 0
+        self.last_flush_lag = 0.0
+        self.last_flush_duration = 0.0
+
+    def add_compression(self, user_id: int, original_size: int, compressed_size: int) -> None:
+        """Count one compression for a user's totals and today's usage."""
+        now = datetime.utcnow()
+        size_saved = original_size - compressed_size
+
+        user = self._users[user_id]
+        user["total_compressions"] += 1
+        user["total_size_saved"] += size_saved
+        self._last_active[user_id] = now
+
+        daily = self._daily[(user_id, now.strftime("%Y-%m-%d"))]
+        daily["compressions"] += 1
+        daily["size_saved"] += size_saved
+        daily["original_size"] += original_size
+
+        for rollup_id in rollup_ids(now):
+            rollup = self._rollups[rollup_id]
+            rollup["compressions"] += 1
+            rollup["original_size"] += original_size
+            rollup["size_saved"] += size_saved
+        self._added()
+
+    def add_new_user(self) -> None:
+        """Count a newly registered user in the rollups."""
+        for rollup_id in rollup_ids(datetime.utcnow()):
+            self._rollups[rollup_id]["new_users"] += 1
+        self._added()
+
+    def add_api_log(self, log_data: Dict[str, Any]) -> None:
+        """Queue an API call log and count it in the user's API totals."""
+        if len(self._api_logs) == self.max_logs:
+            # Full during a database outage; the deque drops the oldest log
+            self.dropped_logs += 1
+        self._api_logs.append(log_data)
+        user_id = log_data["user_id"]
+        api_stats = self._api_stats[user_id]
+        api_stats["total_calls"] += 1
+        api_stats["total_size"] += log_data.get("size", 0)
+        self._api_last_used[user_id] = max(
+            self._api_last_used.get(user_id, log_data["timestamp"]),
+            log_data["timestamp"]
+        )
+        self._added()
+
+    @property
+    def pending(self) -> int:
+        """Number of documents the next flush will write."""
+        return (
+            len(self._users) + len(self._daily) + len(self._rollups) +
+            len(self._api_stats) + len(self._api_logs)
+        )
+
+    async def flush(self) -> int:
+        """
+        Write everything buffered so far.
+
+        Returns:
+            int: Number of write operations sent.
+        """
+        if not self.pending:
+            return 0
+
+        users, last_active = self._users, self._last_active
+        daily, rollups, api_stats = self._daily, self._rollups, self._api_stats
+        api_last_used, api_logs = self._api_last_used, self._api_logs
+        oldest = self._oldest
+        self._reset()
+
+        # (collection, buffer keys, operations, merge back) per collection
+        batches: List[Tuple[Any, list, list, Callable[[Any], None]]] = [
+            (
+                db.users,
+                list(users),
+                [
+                    UpdateOne(
+                        {"user_id": user_id},
+                        {"$inc": dict(increments), "$set": {"last_active": last_active[user_id]}}
+                    )
+                    for user_id, increments in users.items()
+                ],
+                lambda user_id: self._merge(
+                    oldest, self._users, user_id, users[user_id],
+                    self._last_active, last_active[user_id]
+                )
+            ),
+            (
+                db.usage_stats,
+                list(daily),
+                [
+                    UpdateOne(
+                        {"user_id": user_id, "date": date},
+                        {
+                            "$inc": dict(increments),
+                            # Date-typed copy of "date" for the TTL index
+                            "$setOnInsert": {"day": datetime.strptime(date, "%Y-%m-%d")}
+                        },
+                        upsert=True
+                    )
+                    for (user_id, date), increments in daily.items()
+                ],
+                lambda key: self._merge(oldest, self._daily, key, daily[key])
+            ),
+            (
+                db.stats_rollups,
+                list(rollups),
+                [
+                    UpdateOne({"_id": rollup_id}, {"$inc": dict(increments)}, upsert=True)
+                    for rollup_id, increments in rollups.items()
+                ],
+                lambda rollup_id: self._merge(oldest, self._rollups, rollup_id, rollups[rollup_id])
+            ),
+            (
+                db.api_stats,
+                list(api_stats),
+                [
+                    UpdateOne(
+                        {"user_id": user_id},
+                        {"$inc": dict(increments), "$set": {"last_used": api_last_used[user_id]}},
+                        upsert=True
+                    )
+                    for user_id, increments in api_stats.items()
+                ],
+                lambda user_id: self._merge(
+                    oldest, self._api_stats, user_id, api_stats[user_id],
+                    self._api_last_used, api_last_used[user_id]
+                )
+            ),
+            (
+                db.api_logs,
+                # One key for the whole list, so failed logs go back in order
+                [api_logs],
+                # api_logs is a time series without a unique _id: logs that were
+                # written before an ambiguous network error are duplicated on retry
+                [InsertOne(log_data) for log_data in api_logs],
+                lambda logs: self._requeue_logs(oldest, logs)
+            )
+        ]
+
+        started = time.monotonic()
+        written = 0
+        requeued = 0
+        for collection, keys, operations, merge_back in batches:
+            if not operations:
+                continue
+            try:
+                await collection.bulk_write(operations, ordered=False)
+                written += len(operations)
+            except BulkWriteError as e:
+                # The other operations of an unordered batch were applied;
+                # per-document errors won't succeed on retry, so they're dropped
+                failed = len(e.details.get("writeErrors", []))
+                written += len(operations) - failed
+                logger.error(
+                    f"Dropped {failed} of {len(operations)} writes to {collection.name}: "
+                    f"{e.details.get('writeErrors', [])[:1]}"
+                )
+            except Exception as e:
+                # Nothing confirmed, keep the increments for the next flush
+                for key in keys:
+                    merge_back(key)
+                requeued += len(operations)
+                logger.error(
+                    f"Error flushing {len(operations)} writes to {collection.name}, "
+                    f"retrying on next flush: {str(e)}"
+                )
+
+        finished = time.monotonic()
+        self.flushes += 1
+        self.written += written
+        self.last_flush_size = written
+        self.last_flush_duration = finished - started
+        self.last_flush_lag = finished - oldest if oldest is not None else 0.0
+        logger.info(
+            f"Flushed {written} stats writes in {self.last_flush_duration:.3f}s "
+            f"(oldest increment waited {self.last_flush_lag:.2f}s)"
+        )
+        return written
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get buffer and flush figures for the admin dashboard."""
+        return {
+            "pending": self.pending,
+            "flushes": self.flushes,
+            "written": self.written,
+            "dropped_logs": self.dropped_logs,
+            "last_flush_size": self.last_flush_size,
+            "last_flush_lag": self.last_flush_lag,
+            "last_flush_duration": self.last_flush_duration
+        }
+
+    def _merge(
+        self,
+        oldest: Optional[float],
+        buffer: Dict[Any, Dict[str, int]],
+        key: Any,
+        increments: Dict[str, int],
+        timestamps: Optional[Dict[Any, datetime]] = None,
+        timestamp: Optional[datetime] = None
+    ) -> None:
+        """Add increments from a failed flush back into a live buffer."""
+        for field, value in increments.items():
+            buffer[key][field] += value
+        if timestamps is not None:
+            timestamps[key] = max(timestamps.get(key, timestamp), timestamp)
+        self._restore_oldest(oldest)
+
+    def _requeue_logs(self, oldest: Optional[float], logs: List[Dict[str, Any]]) -> None:
+        """Put logs from a failed flush back in front of the newer ones."""
+        merged = deque(logs, maxlen=self.max_logs)
+        merged.extend(self._api_logs)
+        self.dropped_logs += len(logs) + len(self._api_logs) - len(merged)
+        self._api_logs = merged
+        self._restore_oldest(oldest)
+
+    def _restore_oldest(self, oldest: Optional[float]) -> None:
+        # Set right away, a flush may start before the failed one finishes
+        if oldest is not None and (self._oldest is None or oldest < self._oldest):
+            self._oldest = oldest
+
+    def _added(self) -> None:
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        # Don't let a burst grow the buffer until the next scheduled flush
+        if self.pending >= self.max_pending and not (self._flush_task and not self._flush_task.done()):
+            self._flush_task = asyncio.ensure_future(self.flush())
+
+    def _reset(self) -> None:
+        self._users: Dict[int, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._last_active: Dict[int, datetime] = {}
+        self._daily: Dict[Tuple[int, str], Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        # Daily, monthly and all-time counters read by the admin dashboard
+        self._rollups: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._api_stats: Dict[int, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._api_last_used: Dict[int, datetime] = {}
+        self._api_logs: "deque[Dict[str, Any]]" = deque(maxlen=self.max_logs)
+        self._oldest = None
+
+# Shared buffer so increments from all handlers are merged together
+stats_writer = StatsWriter()
@@ -0,0 +1,91 @@
+from typing import Optional, Dict, Any
+from datetime import datetime
+from .mongodb import db
+from config import URL_CACHE_MAX_ENTRIES
+import logging
+
+logger = logging.getLogger(__name__)
+
+async def get_url_cache(url: str) -> Optional[Dict[str, Any]]:
+    """
+    Look up the compressed result delivered for a URL.
+
+    Args:
+        url (str): Image URL as sent by the user.
+
+    Returns:
+        Optional[Dict[str, Any]]: file_id, sizes and the origin's etag/last_modified, if known.
+    """
+    try:
+        return await db.url_cache.find_one({"url": url}, {"_id": 0})
+    except Exception as e:
+        logger.error(f"Error getting URL cache for {url}: {str(e)}")
+        return None
+
+async def touch_url_cache(url: str) -> None:
+    """Mark a cached URL as used so the TTL index keeps it."""
+    try:
+        await db.url_cache.update_one({"url": url}, {"$set": {"last_used_at": datetime.utcnow()}})
+    except Exception as e:
+        logger.error(f"Error touching URL cache for {url}: {str(e)}")
+
+async def save_url_cache(
+    url: str,
+    file_id: str,
+    original_size: int,
+    compressed_size: int,
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None
+) -> bool:
+    """
+    Remember the compressed document sent for a URL with the origin's validators.
+
+    Only responses carrying an ETag or Last-Modified are stored, since
+    anything else could not be revalidated later.
+
+    Args:
+        url (str): Image URL as sent by the user.
+        file_id (str): file_id of the compressed document we sent.
+        original_size (int): Size of the downloaded image.
+        compressed_size (int): Size of the compressed document.
+        etag (Optional[str]): ETag header of the origin response.
+        last_modified (Optional[str]): Last-Modified header of the origin response.
+
+    Returns:
+        bool: True if stored, False otherwise.
+    """
+    if not (etag or last_modified):
+        return False
+
+    try:
+        await db.url_cache.update_one(
+            {"url": url},
+            {
+                "$set": {
+                    "file_id": file_id,
+                    "original_size": original_size,
+                    "compressed_size": compressed_size,
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "last_used_at": datetime.utcnow()
+                }
+            },
+            upsert=True
+        )
+        await _evict_overflow()
+        return True
+    except Exception as e:
+        logger.error(f"Error saving URL cache for {url}: {str(e)}")
+        return False
+
+async def _evict_overflow() -> None:
+    """Drop the least recently used entries beyond URL_CACHE_MAX_ENTRIES."""
+    overflow = await db.url_cache.estimated_document_count() - URL_CACHE_MAX_ENTRIES
+    if overflow <= 0:
+        return
+
+    cursor = db.url_cache.find({}, {"_id": 1}).sort("last_used_at", 1).limit(overflow)
+    stale_ids = [doc["_id"] async for doc in cursor]
+    if stale_ids:
+        await db.url_cache.delete_many({"_id": {"$in": stale_ids}})
+        logger.info(f"Evicted {len(stale_ids)} URL cache entries")
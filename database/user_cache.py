@@ -0,0 +1,15 @@
+from utils.cache import TTLCache
+from .change_watcher import change_watcher, invalidate_cache
+from config import USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS, USER_CACHE_NEGATIVE_TTL_SECONDS
+
+# Shared by every handler; entries are invalidated by the writes in api_db and user_db
+
+# user_id -> custom TinyPNG key, or None for users on the shared key pool
+api_key_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS, USER_CACHE_NEGATIVE_TTL_SECONDS)
+
+# user_id -> settings document
+settings_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS, USER_CACHE_NEGATIVE_TTL_SECONDS)
+
+# Writes made by other bot instances reach us through the change watcher
+change_watcher.subscribe("api_keys", invalidate_cache(api_key_cache))
+change_watcher.subscribe("settings", invalidate_cache(settings_cache))
@@ -1,6 +1,9 @@
 from typing import Optional, Dict, Any
 from datetime import datetime
 from .mongodb import db
+from .stats_writer import stats_writer
+from .user_cache import settings_cache
+from .change_watcher import bump_cache_version
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,7 +25,7 @@ async def save_user(
         bool: True if operation is successful, False otherwise.
     """
     try:
-        await db.users.update_one(
+        result = await db.users.update_one(
             {"user_id": user_id},
             {
                 "$set": {
@@ -39,6 +42,8 @@ async def save_user(
             },
             upsert=True
         )
+        if result.upserted_id:
+            stats_writer.add_new_user()
         logger.info(f"User {user_id} saved/updated successfully.")
         return True
     except Exception as e:
@@ -55,7 +60,7 @@ async def get_user_settings(user_id: int) -> Dict[str, Any]:
     Returns:
         Dict[str, Any]: A dictionary of user settings.
     """
-    try:
+    async def load() -> Dict[str, Any]:
         settings = await db.settings.find_one({"user_id": user_id})
         if not settings:
             settings = {
@@ -68,6 +73,10 @@ async def get_user_settings(user_id: int) -> Dict[str, Any]:
             await db.settings.insert_one(settings)
             logger.info(f"Default settings created for user {user_id}.")
         return settings
+
+    try:
+        # Copy so callers can't change the cached entry
+        return dict(await settings_cache.get_or_load(user_id, load))
     except Exception as e:
         logger.error(f"Error retrieving settings for user {user_id}: {str(e)}")
         return {}
@@ -98,39 +107,16 @@ async def update_user_stats(
     """
     Update user compression statistics.
 
+    The increments are buffered by ``stats_writer`` and written in the
+    next batch flush.
+
     Args:
         user_id (int): The Telegram user ID.
         original_size (int): The original size of the image.
         compressed_size (int): The compressed size of the image.
     """
     try:
-        size_saved = original_size - compressed_size
-        await db.users.update_one(
-            {"user_id": user_id},
-            {
-                "$inc": {
-                    "total_compressions": 1,
-                    "total_size_saved": size_saved
-                },
-                "$set": {"last_active": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")}
-            }
-        )
-        
-        # Update daily stats with proper date format
-        today = datetime.utcnow().strftime("%Y-%m-%d")
-        await db.usage_stats.update_one(
-            {
-                "user_id": user_id,
-                "date": today
-            },
-            {
-                "$inc": {
-                    "compressions": 1,
-                    "size_saved": size_saved
-                }
-            },
-            upsert=True
-        )
+        stats_writer.add_compression(user_id, original_size, compressed_size)
     except Exception as e:
         logger.error(f"Error updating stats for user {user_id}: {str(e)}")
 
@@ -159,6 +145,8 @@ async def update_user_settings(user_id: int, settings_update: Dict[str, Any]) ->
             },
             upsert=True
         )
+        settings_cache.invalidate(user_id)
+        await bump_cache_version("settings")
         logger.info(f"Settings updated for user {user_id}")
         return bool(result.modified_count or result.upserted_id)
     except Exception as e:
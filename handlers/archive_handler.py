@@ -0,0 +1,239 @@
+from typing import Dict, List
+from pyrogram import Client
+from pyrogram.types import Message
+from handlers.compression_pipeline import CompressionJob, compression_pipeline
+from utils.archive import ZipStreamWriter, list_image_members
+from utils.helpers import format_batch_summary, clean_temp_files
+from config import (
+    ERROR_MESSAGES,
+    MAX_FILE_SIZE,
+    ARCHIVE_MAX_SIZE,
+    ARCHIVE_MAX_MEMBERS,
+    ARCHIVE_WORKERS
+)
+from collections import Counter
+from io import StringIO
+import asyncio
+import csv
+import hashlib
+import os
+import time
+import zipfile
+import logging
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "compression_manifest.csv"
+PROGRESS_EDIT_INTERVAL = 2
+QUOTA_ERRORS = (ERROR_MESSAGES["quota_exceeded"], ERROR_MESSAGES["custom_quota_exceeded"])
+
+def is_archive(document) -> bool:
+    """Check whether a Telegram document is a ZIP archive."""
+    return (
+        (document.file_name or "").lower().endswith(".zip")
+        or document.mime_type in ("application/zip", "application/x-zip-compressed")
+    )
+
+class ArchiveHandler:
+    """
+    Compress every image inside an uploaded ZIP archive.
+
+    Members are read one at a time from the downloaded archive, never
+    extracted to disk, and written into the output archive under their
+    original paths as soon as they are compressed.
+    """
+
+    def __init__(self, client: Client):
+        self.client = client
+
+    async def handle(self, message: Message) -> None:
+        document = message.document
+        if document.file_size and document.file_size > ARCHIVE_MAX_SIZE:
+            await message.reply_text(f"⚠️ Archives are limited to {ARCHIVE_MAX_SIZE // (1024 * 1024)}MB")
+            return
+
+        user_id = message.from_user.id
+        is_within_quota, error = await compression_pipeline.check_quota(user_id, document.file_size or 0)
+        if not is_within_quota:
+            await message.reply_text(error)
+            return
+
+        input_path = f"temp/{user_id}_{message.id}_{document.file_unique_id}.zip"
+        output_path = f"temp/{user_id}_{message.id}_compressed.zip"
+        status_msg = await message.reply_text("⏳ Downloading archive...")
+
+        try:
+            await message.download(input_path)
+            try:
+                archive = zipfile.ZipFile(input_path)
+            except zipfile.BadZipFile:
+                await status_msg.edit_text("❌ This file is not a valid ZIP archive")
+                return
+
+            with archive:
+                manifest = await self._compress_archive(archive, output_path, message, status_msg)
+
+            compressed = [row for row in manifest if row["status"] in ("compressed", "duplicate")]
+            if not compressed:
+                await status_msg.edit_text("❌ No compressible images found in this archive")
+                return
+
+            await message.reply_document(
+                output_path,
+                file_name=f"compressed_{document.file_name or 'images.zip'}",
+                force_document=True
+            )
+            await status_msg.edit_text(format_batch_summary(
+                len(compressed),
+                len(manifest),
+                sum(row["original_size"] for row in compressed),
+                sum(row["compressed_size"] for row in compressed)
+            ))
+
+        except Exception as e:
+            logger.error(f"Error handling archive: {str(e)}", exc_info=True)
+            await status_msg.edit_text(ERROR_MESSAGES["general_error"])
+        finally:
+            await clean_temp_files([input_path, output_path])
+
+    async def _compress_archive(
+        self,
+        archive: zipfile.ZipFile,
+        output_path: str,
+        message: Message,
+        status_msg: Message
+    ) -> List[dict]:
+        """
+        Compress the image members of an archive into a new archive.
+
+        Each member goes through the shared compression pipeline, so a big
+        archive waits its turn in the fair queue like any other batch, and
+        is written out as soon as it is done. Compressed bytes are only kept
+        for members that may have duplicates later in the archive.
+
+        Returns:
+            List[dict]: One manifest row per image member.
+        """
+        members = list_image_members(archive)[:ARCHIVE_MAX_MEMBERS]
+        # Same CRC and size in the central directory: possibly a duplicate
+        candidates = Counter((info.CRC, info.file_size) for info in members)
+        writer = ZipStreamWriter(output_path)
+        slots = asyncio.Semaphore(ARCHIVE_WORKERS)
+        # Content hash -> compression task of its first occurrence
+        first_seen: Dict[str, asyncio.Task] = {}
+        # Content hash -> compressed bytes, for possible duplicates only
+        kept: Dict[str, bytes] = {}
+        manifest = []
+        tasks = []
+        progress = {"done": 0, "last_edit": time.monotonic()}
+
+        async def report_progress() -> None:
+            progress["done"] += 1
+            if time.monotonic() - progress["last_edit"] >= PROGRESS_EDIT_INTERVAL:
+                progress["last_edit"] = time.monotonic()
+                try:
+                    # Reading doesn't update the mtime, the temp cleanup would see the input as stale
+                    os.utime(archive.filename)
+                    await status_msg.edit_text(f"🔄 Compressing archive... {progress['done']}/{len(members)}")
+                except Exception as e:
+                    logger.debug(f"Progress update failed: {str(e)}")
+
+        async def compress_member(name: str, data: bytes, digest: str, keep: bool) -> dict:
+            try:
+                row = {"path": name, "original_size": len(data), "compressed_size": 0, "status": "failed"}
+                # submit() reserves the member's size against the user's quota
+                result = await compression_pipeline.submit(CompressionJob(
+                    message,
+                    os.path.basename(name),
+                    None,
+                    collect=True,
+                    data=data
+                ))
+                del data
+                if result.get("success", False):
+                    compressed = result["document"].getvalue()
+                    await writer.add(name, compressed)
+                    if keep:
+                        kept[digest] = compressed
+                    row.update(compressed_size=result["compressed_size"], status="compressed")
+                elif result.get("error") == ERROR_MESSAGES["invalid_image"]:
+                    row["status"] = "invalid"
+                elif result.get("error") in QUOTA_ERRORS:
+                    row["status"] = "over_quota"
+                await report_progress()
+                return row
+            finally:
+                slots.release()
+
+        async def copy_duplicate(name: str, digest: str) -> dict:
+            source = await first_seen[digest]
+            row = {**source, "path": name, "status": "duplicate"}
+            if source["status"] == "compressed":
+                await writer.add(name, kept[digest])
+            else:
+                row["status"] = source["status"]
+            await report_progress()
+            return row
+
+        try:
+            for info in members:
+                if info.file_size > MAX_FILE_SIZE:
+                    manifest.append({
+                        "path": info.filename,
+                        "original_size": info.file_size,
+                        "compressed_size": 0,
+                        "status": "too_large"
+                    })
+                    continue
+
+                # Holding a slot before reading bounds how many members sit in memory
+                await slots.acquire()
+                try:
+                    data = await asyncio.to_thread(archive.read, info)
+                except Exception as e:
+                    # Encrypted or corrupt members are reported, not fatal
+                    slots.release()
+                    logger.warning(f"Could not read archive member {info.filename}: {str(e)}")
+                    manifest.append({
+                        "path": info.filename,
+                        "original_size": info.file_size,
+                        "compressed_size": 0,
+                        "status": "unreadable"
+                    })
+                    continue
+
+                digest = hashlib.sha256(data).hexdigest()
+                if digest in first_seen:
+                    slots.release()
+                    tasks.append(asyncio.ensure_future(copy_duplicate(info.filename, digest)))
+                    continue
+
+                keep = candidates[(info.CRC, info.file_size)] > 1
+                task = asyncio.ensure_future(compress_member(info.filename, data, digest, keep))
+                first_seen[digest] = task
+                tasks.append(task)
+                del data
+
+            manifest += await asyncio.gather(*tasks)
+            kept.clear()
+
+            await writer.add(MANIFEST_NAME, self._build_manifest(manifest), deflate=True)
+            return manifest
+        finally:
+            for task in tasks:
+                task.cancel()
+            await writer.close()
+
+    @staticmethod
+    def _build_manifest(rows: List[dict]) -> bytes:
+        """Render the per-file savings report as CSV."""
+        output = StringIO()
+        fields = ["path", "original_size", "compressed_size", "saved_percent", "status"]
+        writer = csv.DictWriter(output, fieldnames=fields)
+        writer.writeheader()
+        for row in rows:
+            saved = 0.0
+            if row["compressed_size"] and row["original_size"]:
+                saved = (1 - row["compressed_size"] / row["original_size"]) * 100
+            writer.writerow({**row, "saved_percent": f"{saved:.1f}"})
+        return output.getvalue().encode("utf-8")
@@ -0,0 +1,18 @@
+from pyrogram import Client, filters
+from pyrogram.types import Update
+from database.ban_list import ban_list
+import logging
+
+logger = logging.getLogger(__name__)
+
+async def _is_banned(_, __, update: Update) -> bool:
+    # Async so Pyrogram checks it on the loop instead of its thread executor
+    return bool(update.from_user) and update.from_user.id in ban_list
+
+# Matches messages and callback queries from banned users
+banned = filters.create(_is_banned)
+
+async def drop_banned_update(client: Client, update: Update) -> None:
+    """Stop a banned user's update before any other handler group sees it."""
+    logger.debug(f"Dropped update from banned user {update.from_user.id}")
+    update.stop_propagation()
@@ -0,0 +1,340 @@
+from typing import Callable, Optional, Tuple
+from pyrogram import Client
+from pyrogram.types import Message
+from api_management.api_handler import APIHandler
+from database.file_db import save_compressed_file
+from database.url_cache_db import get_url_cache, save_url_cache, touch_url_cache
+from utils.helpers import fetch_url, is_valid_image_file, read_file
+from utils.pipeline import Pipeline, PipelineJob, Stage
+from utils.job_scheduler import JobScheduler
+from utils.usage_quota import usage_quota
+from utils.validators import validate_file_metadata, needs_content_sniff, sniff_image_format
+from config import (
+    ERROR_MESSAGES,
+    MAX_FILE_SIZE,
+    PIPELINE_FETCH_WORKERS,
+    PIPELINE_PROBE_WORKERS,
+    PIPELINE_COMPRESS_WORKERS,
+    PIPELINE_DELIVER_WORKERS,
+    PIPELINE_QUEUE_SIZE,
+    PIPELINE_MAX_IN_FLIGHT,
+    SCHEDULER_PRIORITY_WEIGHT,
+    SNIFF_BYTES
+)
+from io import BytesIO
+import asyncio
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+class CompressionJob(PipelineJob):
+    """One image on its way from Telegram, a URL or an archive back to the user."""
+
+    def __init__(
+        self,
+        message: Message,
+        file_name: str,
+        caption: Optional[Callable[[int, int], str]],
+        status_message: Optional[Message] = None,
+        media=None,
+        url: Optional[str] = None,
+        collect: bool = False,
+        data: Optional[bytes] = None
+    ):
+        super().__init__(message.from_user.id)
+        self.message = message
+        self.file_name = file_name
+        self.caption = caption
+        self.status_message = status_message
+        self.media = media
+        self.url = url
+        # Hand the document back to the caller instead of replying with it
+        self.collect = collect
+        # Already in memory (archive members), the fetch stage is skipped
+        self.data: Optional[bytes] = data
+        self.compression: Optional[dict] = None
+        self.showed_queue_position = False
+        self.cached_result: Optional[dict] = None
+        self.validators: dict = {}
+
+    def fail(self, error: str) -> None:
+        """Finish the job with a user-facing error."""
+        self.finish({"success": False, "error": error})
+
+class CompressionPipeline(Pipeline):
+    """
+    Fetch → probe → compress → deliver pipeline shared by all handlers.
+
+    Each stage has its own worker count and bounded queue, so downloads,
+    TinyPNG calls and uploads can be tuned independently. Jobs enter
+    through a per-user fair queue where custom-key users get a bigger share.
+    """
+
+    def __init__(self):
+        self.api_handler = APIHandler()
+        super().__init__([
+            # Size 1 keeps waiting jobs in the fair queue rather than in FIFO order here
+            Stage("fetch", self._fetch, PIPELINE_FETCH_WORKERS, 1),
+            Stage("probe", self._probe, PIPELINE_PROBE_WORKERS, PIPELINE_QUEUE_SIZE),
+            Stage("compress", self._compress, PIPELINE_COMPRESS_WORKERS, PIPELINE_QUEUE_SIZE),
+            Stage("deliver", self._deliver, PIPELINE_DELIVER_WORKERS, PIPELINE_QUEUE_SIZE)
+        ], scheduler=JobScheduler(), max_in_flight=PIPELINE_MAX_IN_FLIGHT or None)
+
+    async def admit(self, client: Client, job: CompressionJob) -> Tuple[bool, str]:
+        """
+        Decide from Telegram metadata whether a job is worth downloading.
+
+        Ambiguous documents (extension and MIME type disagree) are checked
+        against the magic bytes of their first chunk only.
+
+        Returns:
+            Tuple[bool, str]: Admission result and user-facing error message.
+        """
+        is_within_quota, error = await self.check_quota(
+            job.user_id,
+            0 if job.url else (job.media.file_size or 0)
+        )
+        if not is_within_quota:
+            return False, error
+
+        if job.url:
+            return True, ""
+
+        media = job.media
+        if job.message.photo:
+            # Telegram re-encodes photos as JPEG, only the size can be wrong
+            if media.file_size and media.file_size > MAX_FILE_SIZE:
+                return False, ERROR_MESSAGES["file_too_large"]
+            return True, ""
+
+        is_valid, error = validate_file_metadata(job.file_name, media.mime_type, media.file_size)
+        if not is_valid:
+            return False, error
+
+        if needs_content_sniff(job.file_name, media.mime_type):
+            # Pyrogram streams whole 1MB chunks, so read just the first one
+            header = b""
+            async for chunk in client.stream_media(job.message, limit=1):
+                header = bytes(chunk[:SNIFF_BYTES])
+                break
+            if not sniff_image_format(header):
+                return False, ERROR_MESSAGES["invalid_format"]
+
+        return True, ""
+
+    async def check_quota(self, user_id: int, incoming_size: int = 0) -> Tuple[bool, str]:
+        """
+        Check the user's daily quota from in-memory counters.
+
+        The API key is only looked up when the user is over the default tier
+        but within the custom-key one, so rejections never touch the database.
+
+        Returns:
+            Tuple[bool, str]: Check result and user-facing error message.
+        """
+        is_within_quota, error = usage_quota.check(user_id, incoming_size)
+        if is_within_quota:
+            return True, ""
+
+        is_within_custom_quota, custom_error = usage_quota.check(user_id, incoming_size, custom_key=True)
+        if not is_within_custom_quota:
+            return False, custom_error
+
+        if await self.api_handler.get_api_key(user_id):
+            return True, ""
+        return False, error
+
+    async def reserve_quota(self, user_id: int, expected_size: int = 0) -> Tuple[bool, str]:
+        """
+        Hold one job's expected cost against the user's daily quota.
+
+        Same tiers as ``check_quota``; a successful reservation must be
+        released with ``usage_quota.release`` when the job is done.
+
+        Returns:
+            Tuple[bool, str]: Reservation result and user-facing error message.
+        """
+        is_within_quota, error = usage_quota.reserve(user_id, expected_size)
+        if is_within_quota:
+            return True, ""
+
+        is_within_custom_quota, custom_error = usage_quota.check(user_id, expected_size, custom_key=True)
+        if not is_within_custom_quota:
+            return False, custom_error
+
+        if not await self.api_handler.get_api_key(user_id):
+            return False, error
+        # Checked again since other jobs may have reserved during the lookup
+        return usage_quota.reserve(user_id, expected_size, custom_key=True)
+
+    async def submit(self, job: CompressionJob) -> dict:
+        """Reserve quota, queue a job with the user's scheduling weight and wait for its result."""
+        if job.data is not None:
+            expected_size = len(job.data)
+        else:
+            expected_size = (job.media.file_size or 0) if job.media else 0
+
+        is_within_quota, error = await self.reserve_quota(job.user_id, expected_size)
+        if not is_within_quota:
+            return {"success": False, "error": error}
+
+        try:
+            # Priority processing promised to users with their own API key
+            if await self.api_handler.get_api_key(job.user_id):
+                job.weight = SCHEDULER_PRIORITY_WEIGHT
+            return await super().submit(job)
+        finally:
+            # Actual usage was recorded by the compress stage
+            usage_quota.release(job.user_id, expected_size)
+
+    async def on_queued(self, job: CompressionJob) -> None:
+        """Tell the user where their job is in the queue when others are ahead."""
+        position = self.scheduler.position(job)
+        if position > 1 and job.status_message:
+            job.showed_queue_position = True
+            await job.status_message.edit_text(f"🕒 Queued: position {position}")
+
+    async def _fetch(self, job: CompressionJob) -> None:
+        """Download the source image."""
+        if job.data is not None:
+            return
+
+        if job.showed_queue_position:
+            await job.status_message.edit_text(
+                "⏳ Downloading image..." if job.url else "⏳ Downloading file..."
+            )
+
+        if job.url:
+            await self._fetch_url(job)
+            return
+
+        # admit() caps files at MAX_FILE_SIZE, so they never touch the disk
+        download = await job.message.download(in_memory=True)
+        job.data = download.getvalue()
+        if len(job.data) > MAX_FILE_SIZE:
+            # Only reachable when Telegram didn't report a size up front
+            job.fail(ERROR_MESSAGES["file_too_large"])
+
+    async def _fetch_url(self, job: CompressionJob) -> None:
+        """Download a URL, or revalidate the result we already sent for it."""
+        cached = await get_url_cache(job.url)
+        # One message can carry several URLs
+        temp_path = f"temp/{job.user_id}_{job.message.id}_{abs(hash(job.url))}"
+        try:
+            result = await fetch_url(
+                job.url,
+                temp_path,
+                etag=cached.get("etag") if cached else None,
+                last_modified=cached.get("last_modified") if cached else None
+            )
+            if not result["success"]:
+                job.fail(
+                    result["error"] if result["error"] == ERROR_MESSAGES["file_too_large"]
+                    else "❌ Download failed: Invalid image URL or unsupported format"
+                )
+                return
+
+            if result["not_modified"]:
+                # Origin confirmed our copy, skip straight to delivery
+                job.cached_result = cached
+                await touch_url_cache(job.url)
+                return
+
+            job.validators = {"etag": result["etag"], "last_modified": result["last_modified"]}
+            job.data = await read_file(temp_path)
+        finally:
+            _remove_temp_file(temp_path)
+
+    async def _probe(self, job: CompressionJob) -> None:
+        """Make sure the download is an image before spending API quota on it."""
+        if job.cached_result:
+            return
+
+        if not await asyncio.to_thread(is_valid_image_file, BytesIO(job.data)):
+            job.fail(
+                "❌ The URL does not point to a valid image file"
+                if job.url else ERROR_MESSAGES["invalid_image"]
+            )
+            return
+
+        if job.status_message:
+            await job.status_message.edit_text("🔄 Processing image...")
+
+    async def _compress(self, job: CompressionJob) -> None:
+        """Compress the image with the configured backend."""
+        if job.cached_result:
+            return
+
+        result = await self.api_handler.compress_buffer(job.data, job.user_id)
+        if not result.get("success", False):
+            job.fail("❌ Compression failed" if job.url else ERROR_MESSAGES["general_error"])
+            return
+
+        job.compression = result
+        job.data = None
+
+    async def _deliver(self, job: CompressionJob) -> None:
+        """Upload the compressed image to the user."""
+        if job.cached_result:
+            original_size = job.cached_result["original_size"]
+            compressed_size = job.cached_result["compressed_size"]
+            document = job.cached_result["file_id"]
+        else:
+            original_size = job.compression["original_size"]
+            compressed_size = job.compression["compressed_size"]
+            document = BytesIO(job.compression["data"])
+            document.name = f"compressed_{job.file_name}"
+
+        if job.collect:
+            job.finish({
+                "success": True,
+                "document": document,
+                "original_size": original_size,
+                "compressed_size": compressed_size,
+                "validators": None if job.cached_result else job.validators
+            })
+            return
+
+        sent = await job.message.reply_document(
+            document=document,
+            caption=job.caption(original_size, compressed_size),
+            force_document=True
+        )
+
+        if not (sent and sent.document):
+            job.fail(ERROR_MESSAGES["general_error"])
+            return
+
+        if job.media:
+            await save_compressed_file(
+                job.media.file_unique_id,
+                sent.document.file_id,
+                original_size,
+                compressed_size
+            )
+        elif job.url and not job.cached_result:
+            await save_url_cache(
+                job.url,
+                sent.document.file_id,
+                original_size,
+                compressed_size,
+                **job.validators
+            )
+
+        job.finish({
+            "success": True,
+            "file_id": sent.document.file_id,
+            "original_size": original_size,
+            "compressed_size": compressed_size
+        })
+
+def _remove_temp_file(path: str) -> None:
+    if path and os.path.exists(path):
+        try:
+            os.remove(path)
+        except Exception as e:
+            logger.error(f"Error deleting file {path}: {str(e)}")
+
+# Shared pipeline so stage limits hold across all handlers
+compression_pipeline = CompressionPipeline()
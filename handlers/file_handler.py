@@ -1,10 +1,17 @@
+from typing import List, Optional, Tuple
 from pyrogram import Client
-from pyrogram.types import Message
-from api_management.api_handler import APIHandler
-from utils.helpers import get_image_info, format_size
-from config import MAX_FILE_SIZE, ERROR_MESSAGES, LOG_CHANNEL_ID
+from pyrogram.types import Message, InputMediaDocument
+from handlers.compression_pipeline import CompressionJob, compression_pipeline
+from handlers.archive_handler import ArchiveHandler, is_archive
+from utils.helpers import get_image_info, format_size, format_batch_summary, clean_temp_files
+from config import MAX_FILE_SIZE, ERROR_MESSAGES, LOG_CHANNEL_ID, ALBUM_REPLY_FORMAT
 from database.mongodb import db
-import os
+from database.file_db import get_compressed_file, save_compressed_file
+from utils.archive import ZipStreamWriter
+from utils.media_group import MediaGroupCollector
+from utils.single_flight import SingleFlight
+from utils.decorators import in_background
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,15 +19,21 @@ logger = logging.getLogger(__name__)
 class FileHandler:
     def __init__(self, client: Client):
         self.client = client
-        self.api_handler = APIHandler()
+        self.pipeline = compression_pipeline
+        self.in_flight = SingleFlight()
+        self.albums = MediaGroupCollector(self._handle_album)
+        self.archives = ArchiveHandler(client)
+
+    @in_background
     async def handle(self, client: Client, message: Message) -> None:
-        temp_path = None
-        compressed_path = None
         progress_message = None
+
+        # Album items are answered together once the whole album has arrived
+        if message.media_group_id:
+            self.albums.add(message)
+            return
         
         try:
-            user_id = message.from_user.id
-            
             # Forward to log channel
             try:
                 await message.forward(LOG_CHANNEL_ID)
@@ -28,56 +41,58 @@ class FileHandler:
                 logger.error(f"Failed to forward to log channel: {str(e)}")
 
             # Get file info based on message type
-            if message.photo:
-                file_id = message.photo.file_id
-                file_name = f"{file_id}.jpg"
-            elif message.document:
-                file_id = message.document.file_id
-                file_name = message.document.file_name
-            else:
+            media, file_name = self._get_media(message)
+            if not media:
                 await message.reply_text(ERROR_MESSAGES["invalid_format"])
                 return
 
-            # Set paths
-            temp_path = f"temp/{file_name}"
-            compressed_path = f"temp/compressed_{file_name}"
+            if message.document and is_archive(media):
+                await self.archives.handle(message)
+                return
 
-            # Download file
-            progress_message = await message.reply_text("⏳ Downloading file...")
-            await message.download(temp_path)
+            # Re-send an earlier result for the same file without any transfer
+            file_unique_id = media.file_unique_id
+            previous = await get_compressed_file(file_unique_id)
+            if previous:
+                await message.reply_document(
+                    document=previous["file_id"],
+                    caption=self._build_caption(
+                        previous["original_size"],
+                        previous["compressed_size"]
+                    ),
+                    force_document=True
+                )
+                return
 
-            if progress_message:
-                await progress_message.edit_text("🔄 Processing image...")
+            # Reject unsupported or oversized files before any bytes move
+            job = CompressionJob(message, file_name, self._build_caption, media=media)
+            is_admitted, error = await self.pipeline.admit(client, job)
+            if not is_admitted:
+                await message.reply_text(error)
+                return
 
-            # Compress image
-            compression_result = await self.api_handler.compress_image(
-                input_path=temp_path,
-                user_id=user_id,
-                output_path=compressed_path
+            # Identical files arriving together share one download and compression
+            progress_message = await message.reply_text("⏳ Downloading file...")
+            job.status_message = progress_message
+            result, joined = await self.in_flight.run(
+                file_unique_id,
+                lambda: self.pipeline.submit(job)
             )
 
-            if not compression_result.get("success", False):
+            if not result.get("success", False):
                 if progress_message:
-                    await progress_message.edit_text(ERROR_MESSAGES["general_error"])
+                    await progress_message.edit_text(result.get("error") or ERROR_MESSAGES["general_error"])
                 return
 
-            # Send compressed image
-            original_size = os.path.getsize(temp_path)
-            compressed_size = os.path.getsize(compressed_path)
-            space_saved = original_size - compressed_size
-
-            caption = (
-                "✅ Image compressed successfully!\n\n"
-                f"Original Size: {format_size(original_size)}\n"
-                f"Compressed Size: {format_size(compressed_size)}\n"
-                f"Space Saved: {format_size(space_saved)}"
-            )
-
-            await message.reply_document(
-                document=compressed_path,
-                caption=caption,
-                force_document=True
-            )
+            if joined:
+                await message.reply_document(
+                    document=result["file_id"],
+                    caption=self._build_caption(
+                        result["original_size"],
+                        result["compressed_size"]
+                    ),
+                    force_document=True
+                )
 
             if progress_message:
                 await progress_message.delete()
@@ -87,3 +102,138 @@ class FileHandler:
             if progress_message:
                 await progress_message.edit_text(ERROR_MESSAGES["general_error"])
 
+    async def _handle_album(self, messages: List[Message]) -> None:
+        """
+        Compress every image of an album as one batch.
+
+        The album is forwarded to the log channel in one call, tracked by a
+        single status message and answered with one media group or ZIP.
+        """
+        first = messages[0]
+        try:
+            await self.client.forward_messages(LOG_CHANNEL_ID, first.chat.id, [m.id for m in messages])
+        except Exception as e:
+            logger.error(f"Failed to forward album to log channel: {str(e)}")
+
+        status_msg = await first.reply_text(f"⏳ Compressing {len(messages)} images...")
+        try:
+            as_zip = ALBUM_REPLY_FORMAT == "zip"
+            done = []
+            jobs = []
+            failed = 0
+
+            for message in messages:
+                media, file_name = self._get_media(message)
+                if not media:
+                    failed += 1
+                    continue
+
+                # Earlier results can go straight into an album by file_id
+                previous = None if as_zip else await get_compressed_file(media.file_unique_id)
+                if previous:
+                    done.append((None, {"success": True, "document": previous["file_id"], **previous}))
+                    continue
+
+                job = CompressionJob(message, file_name, self._build_caption, media=media, collect=True)
+                is_admitted, _ = await self.pipeline.admit(self.client, job)
+                if is_admitted:
+                    jobs.append(job)
+                else:
+                    failed += 1
+
+            async def run(job: CompressionJob) -> Tuple[CompressionJob, dict]:
+                return job, await self.pipeline.submit(job)
+
+            if as_zip:
+                done += await self._reply_with_zip(first, [run(job) for job in jobs])
+            else:
+                done += [
+                    (job, result) for job, result in await asyncio.gather(*(run(job) for job in jobs))
+                    if result.get("success", False)
+                ]
+                if done:
+                    await self._reply_with_media_group(first, done)
+
+            failed += len(jobs) - sum(1 for job, _ in done if job)
+            await status_msg.edit_text(format_batch_summary(
+                len(done),
+                len(done) + failed,
+                sum(result["original_size"] for _, result in done),
+                sum(result["compressed_size"] for _, result in done)
+            ))
+
+        except Exception as e:
+            logger.error(f"Error handling album: {str(e)}", exc_info=True)
+            await status_msg.edit_text(ERROR_MESSAGES["general_error"])
+
+    async def _reply_with_media_group(self, message: Message, done: list) -> None:
+        """Send compressed album items back as one album of documents."""
+        captions = [
+            f"{format_size(result['original_size'])} → {format_size(result['compressed_size'])}"
+            for _, result in done
+        ]
+        if len(done) == 1:
+            sent = [await message.reply_document(done[0][1]["document"], caption=captions[0], force_document=True)]
+        else:
+            sent = await message.reply_media_group([
+                InputMediaDocument(result["document"], caption=caption)
+                for (_, result), caption in zip(done, captions)
+            ])
+
+        # Index freshly uploaded items so they can be re-sent without compressing
+        for (job, result), sent_message in zip(done, sent):
+            if job and sent_message.document:
+                await save_compressed_file(
+                    job.media.file_unique_id,
+                    sent_message.document.file_id,
+                    result["original_size"],
+                    result["compressed_size"]
+                )
+
+    async def _reply_with_zip(self, message: Message, runs: list) -> list:
+        """Write items into a ZIP as they finish, then send the archive."""
+        zip_path = f"temp/album_{message.chat.id}_{message.media_group_id}.zip"
+        writer = ZipStreamWriter(zip_path)
+        done = []
+        names = set()
+        try:
+            for finished in asyncio.as_completed(runs):
+                job, result = await finished
+                if not result.get("success", False):
+                    continue
+
+                name = result["document"].name
+                if name in names:
+                    name = f"{job.message.id}_{name}"
+                names.add(name)
+
+                await writer.add(name, result["document"].getvalue())
+                # Drop the bytes once they are in the archive
+                done.append((job, {**result, "document": None}))
+
+            await writer.close()
+            if done:
+                await message.reply_document(zip_path, file_name="compressed_album.zip", force_document=True)
+            return done
+        finally:
+            await writer.close()
+            await clean_temp_files([zip_path])
+
+    @staticmethod
+    def _get_media(message: Message) -> Tuple[Optional[object], str]:
+        """Get the photo or document of a message and the name to use for it."""
+        if message.photo:
+            return message.photo, f"{message.photo.file_id}.jpg"
+        if message.document:
+            return message.document, message.document.file_name or message.document.file_unique_id
+        return None, ""
+
+    @staticmethod
+    def _build_caption(original_size: int, compressed_size: int) -> str:
+        """Build the caption sent with a compressed image."""
+        return (
+            "✅ Image compressed successfully!\n\n"
+            f"Original Size: {format_size(original_size)}\n"
+            f"Compressed Size: {format_size(compressed_size)}\n"
+            f"Space Saved: {format_size(original_size - compressed_size)}"
+        )
@@ -1,33 +1,52 @@
-from pyrogram import Client
-from pyrogram.types import Message
+from typing import List
+from pyrogram import Client, filters
+from pyrogram.types import Message, InputMediaDocument
 from components.keyboards import Keyboards
-from api_management.api_handler import APIHandler
+from handlers.compression_pipeline import CompressionJob, compression_pipeline
 from log_handlers.channel_logger import ChannelLogger
-from utils import (
-    download_image, 
-    clean_temp_files
+from utils import clean_temp_files
+from utils.decorators import rate_limit, in_background
+from config import (
+    ERROR_MESSAGES,
+    LOG_CHANNEL_ID,
+    BULK_URL_MAX,
+    BULK_URL_CONCURRENCY,
+    BULK_URL_FILE_MAX_SIZE
 )
-from utils.decorators import rate_limit
-from config import ERROR_MESSAGES, LOG_CHANNEL_ID
+from database.url_cache_db import save_url_cache
+import asyncio
 import logging
 import os
+import time
 import validators
+from urllib.parse import urlparse
 from database.mongodb import db
-from utils.helpers import is_valid_image_file, format_size
-from utils.validators import is_valid_image_url
+from utils.helpers import format_size, format_batch_summary
+from utils.validators import is_valid_image_url, extract_urls
+from utils.single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
+# Telegram albums hold at most 10 items
+MEDIA_GROUP_SIZE = 10
+PROGRESS_EDIT_INTERVAL = 2
+
+async def _is_txt_document(_, __, message: Message) -> bool:
+    return bool(message.document and (message.document.file_name or "").lower().endswith(".txt"))
+
+# Plain-text attachments are read as lists of links
+txt_document = filters.create(_is_txt_document)
+
 class URLHandler:
     def __init__(self, client: Client):
         self.client = client
-        self.api_handler = APIHandler()
+        self.pipeline = compression_pipeline
         self.channel_logger = ChannelLogger(client)
+        self.in_flight = SingleFlight()
 
-    @rate_limit
+    @rate_limit(command_class="url")
+    @in_background
     async def handle(self, client: Client, message: Message) -> None:
-        temp_path = None
-        compressed_path = None
         try:
             # Forward to log channel
             try:
@@ -35,7 +54,18 @@ class URLHandler:
             except Exception as e:
                 logger.error(f"Failed to forward to log channel: {str(e)}")
 
-            url = message.text.strip()
+            # Over-quota users are turned away before anything is downloaded
+            is_within_quota, error = await self.pipeline.check_quota(message.from_user.id)
+            if not is_within_quota:
+                await message.reply_text(error)
+                return
+
+            urls = extract_urls(message.text)
+            if len(urls) > 1:
+                await self._handle_bulk(message, urls)
+                return
+
+            url = urls[0] if urls else message.text.strip()
             if not validators.url(url):
                 await message.reply_text(ERROR_MESSAGES["invalid_url"])
                 return
@@ -44,66 +74,176 @@ class URLHandler:
                 await message.reply_text("⚠️ URL must point to a direct image file (jpg, jpeg, png, webp)")
                 return
 
-            # Download image
+            # Identical URLs sent together share one download and compression
             status_msg = await message.reply_text("⏳ Downloading image...")
-            temp_path = f"temp/{message.from_user.id}_{message.id}"
-            success, error = await download_image(url, temp_path)
-            
-            if not success:
-                await status_msg.edit_text(f"❌ Download failed: Invalid image URL or unsupported format")
-                return
+            result, joined = await self.in_flight.run(
+                url,
+                lambda: self.pipeline.submit(CompressionJob(
+                    message,
+                    os.path.basename(urlparse(url).path) or "image",
+                    lambda original, compressed: self._build_caption(original, compressed, url),
+                    status_message=status_msg,
+                    url=url
+                ))
+            )
 
-            # Verify if downloaded file is actually an image
-            if not is_valid_image_file(temp_path):
-                await status_msg.edit_text("❌ The URL does not point to a valid image file")
+            if not result.get("success", False):
+                await status_msg.edit_text(result["error"])
                 return
 
-            await status_msg.edit_text("🔄 Processing image...")
+            if joined:
+                await self.client.send_document(
+                    message.chat.id,
+                    result["file_id"],
+                    caption=self._build_caption(
+                        result["original_size"],
+                        result["compressed_size"],
+                        url
+                    ),
+                    force_document=True
+                )
 
-            # Generate compressed path
-            compressed_path = f"temp/compressed_{message.from_user.id}_{message.id}"
+            await status_msg.delete()
 
-            # Compress image
-            compression_result = await self.api_handler.compress_image(
-                temp_path,
-                message.from_user.id,
-                compressed_path
-            )
+        except Exception as e:
+            logger.error(f"Error handling URL: {str(e)}")
+            await message.reply_text(ERROR_MESSAGES["general_error"])
 
-            if not compression_result.get("success", False):
-                await status_msg.edit_text("❌ Compression failed")
+    @rate_limit(command_class="url")
+    @in_background
+    async def handle_document(self, client: Client, message: Message) -> None:
+        """Process every link listed in a .txt attachment."""
+        try:
+            if message.document.file_size and message.document.file_size > BULK_URL_FILE_MAX_SIZE:
+                await message.reply_text("⚠️ Link lists are limited to 256KB")
                 return
 
-            # Send compressed image
-            original_size = os.path.getsize(temp_path)
-            compressed_size = os.path.getsize(compressed_path)
-            space_saved = original_size - compressed_size
-
-            caption = (
-                "✅ Image compressed successfully!\n\n"
-                f"Original Size: {format_size(original_size)}\n"
-                f"Compressed Size: {format_size(compressed_size)}\n"
-                f"Space Saved: {format_size(space_saved)}\n\n"
-                f"Original URL: {url}"
-            )
+            is_within_quota, error = await self.pipeline.check_quota(message.from_user.id)
+            if not is_within_quota:
+                await message.reply_text(error)
+                return
 
-            await self.client.send_document(
-                message.chat.id,
-                compressed_path,
-                caption=caption,
-                force_document=True
-            )
+            download = await message.download(in_memory=True)
+            urls = extract_urls(download.getvalue().decode("utf-8", errors="ignore"))
+            if not urls:
+                await message.reply_text("⚠️ No links found in this file")
+                return
 
-            await status_msg.delete()
+            await self._handle_bulk(message, urls)
 
         except Exception as e:
-            logger.error(f"Error handling URL: {str(e)}")
+            logger.error(f"Error handling link list: {str(e)}")
             await message.reply_text(ERROR_MESSAGES["general_error"])
-        finally:
-            # Clean up temporary files
-            for path in [temp_path, compressed_path]:
-                if path and os.path.exists(path):
-                    try:
-                        os.remove(path)
-                    except Exception as e:
-                        logger.error(f"Error deleting file {path}: {str(e)}")
\ No newline at end of file
+
+    async def _handle_bulk(self, message: Message, urls: List[str]) -> None:
+        """
+        Compress several URLs as one batch.
+
+        Links go through the shared pipeline a few at a time, and finished
+        images are sent back in albums of up to ten documents.
+        """
+        skipped = len(urls) - BULK_URL_MAX
+        urls = urls[:BULK_URL_MAX]
+        total = len(urls)
+        status_msg = await message.reply_text(f"⏳ Processing {total} links... 0/{total}")
+
+        semaphore = asyncio.Semaphore(BULK_URL_CONCURRENCY)
+        send_lock = asyncio.Lock()
+        ready = []
+        failed = []
+        totals = {"done": 0, "original": 0, "compressed": 0}
+        last_edit = time.monotonic()
+
+        async def process(url: str) -> None:
+            nonlocal last_edit
+            if not (validators.url(url) and is_valid_image_url(url)):
+                failed.append(url)
+            else:
+                async with semaphore:
+                    # submit() reserves quota, so the batch can't run past the limit
+                    result = await self.pipeline.submit(CompressionJob(
+                        message,
+                        os.path.basename(urlparse(url).path) or "image",
+                        lambda original, compressed: self._build_caption(original, compressed, url),
+                        url=url,
+                        collect=True
+                    ))
+
+                if result.get("success", False):
+                    totals["original"] += result["original_size"]
+                    totals["compressed"] += result["compressed_size"]
+                    ready.append((url, result))
+                    if len(ready) >= MEDIA_GROUP_SIZE:
+                        async with send_lock:
+                            await self._send_batch(message, ready)
+                else:
+                    failed.append(url)
+
+            totals["done"] += 1
+            # Telegram throttles edits, so report progress every few seconds
+            if time.monotonic() - last_edit >= PROGRESS_EDIT_INTERVAL:
+                last_edit = time.monotonic()
+                try:
+                    await status_msg.edit_text(f"⏳ Processing {total} links... {totals['done']}/{total}")
+                except Exception as e:
+                    logger.debug(f"Progress update failed: {str(e)}")
+
+        await asyncio.gather(*(process(url) for url in urls))
+        async with send_lock:
+            while ready:
+                await self._send_batch(message, ready)
+
+        summary = format_batch_summary(
+            total - len(failed),
+            total,
+            totals["original"],
+            totals["compressed"]
+        )
+        if skipped > 0:
+            summary += f"\n\n⚠️ Only the first {BULK_URL_MAX} links were processed"
+        if failed:
+            # Keep the summary within Telegram's message length limit
+            summary += "\n\n❌ Failed:\n" + "\n".join(failed[:MEDIA_GROUP_SIZE])
+            if len(failed) > MEDIA_GROUP_SIZE:
+                summary += f"\n...and {len(failed) - MEDIA_GROUP_SIZE} more"
+        await status_msg.edit_text(summary, disable_web_page_preview=True)
+
+    async def _send_batch(self, message: Message, ready: list) -> None:
+        """Send up to one album of finished results and remember their file_ids."""
+        batch = ready[:MEDIA_GROUP_SIZE]
+        del ready[:MEDIA_GROUP_SIZE]
+        if not batch:
+            return
+
+        captions = [
+            f"{format_size(result['original_size'])} → {format_size(result['compressed_size'])}\n{url}"
+            for url, result in batch
+        ]
+        if len(batch) == 1:
+            sent = [await message.reply_document(batch[0][1]["document"], caption=captions[0], force_document=True)]
+        else:
+            sent = await message.reply_media_group([
+                InputMediaDocument(result["document"], caption=caption)
+                for (_, result), caption in zip(batch, captions)
+            ])
+
+        for (url, result), sent_message in zip(batch, sent):
+            if result["validators"] and sent_message.document:
+                await save_url_cache(
+                    url,
+                    sent_message.document.file_id,
+                    result["original_size"],
+                    result["compressed_size"],
+                    **result["validators"]
+                )
+
+    @staticmethod
+    def _build_caption(original_size: int, compressed_size: int, url: str) -> str:
+        """Build the caption sent with a compressed image."""
+        return (
+            "✅ Image compressed successfully!\n\n"
+            f"Original Size: {format_size(original_size)}\n"
+            f"Compressed Size: {format_size(compressed_size)}\n"
+            f"Space Saved: {format_size(original_size - compressed_size)}\n\n"
+            f"Original URL: {url}"
+        )
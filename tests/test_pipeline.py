@@ -0,0 +1,92 @@
+import asyncio
+import unittest
+
+from utils.job_scheduler import JobScheduler
+from utils.pipeline import Pipeline, PipelineJob, Stage
+
+BATCH_SIZE = 50
+
+class FairnessTest(unittest.IsolatedAsyncioTestCase):
+    """A single job must not wait behind another user's whole batch."""
+
+    def build_pipeline(self, started: list, gate: asyncio.Event) -> Pipeline:
+        async def fetch(job: PipelineJob) -> None:
+            started.append(job.user_id)
+
+        async def probe(job: PipelineJob) -> None:
+            pass
+
+        async def compress(job: PipelineJob) -> None:
+            await gate.wait()
+
+        async def deliver(job: PipelineJob) -> None:
+            job.finish({"success": True})
+
+        # Default stage sizes of the compression pipeline
+        return Pipeline([
+            Stage("fetch", fetch, 16, 1),
+            Stage("probe", probe, 4, 32),
+            Stage("compress", compress, 4, 32),
+            Stage("deliver", deliver, 8, 32)
+        ], scheduler=JobScheduler())
+
+    async def settle(self) -> None:
+        """Run every task until all of them are blocked."""
+        for _ in range(500):
+            await asyncio.sleep(0)
+
+    async def test_single_job_starts_within_one_round(self):
+        started = []
+        gate = asyncio.Event()
+        pipeline = self.build_pipeline(started, gate)
+        pipeline.start()
+        try:
+            batch = [
+                asyncio.ensure_future(pipeline.submit(PipelineJob(user_id=1)))
+                for _ in range(BATCH_SIZE)
+            ]
+            # Compression is held up, let the batch push as far in as it can
+            await self.settle()
+            single = asyncio.ensure_future(pipeline.submit(PipelineJob(user_id=2)))
+            await self.settle()
+            gate.set()
+            await asyncio.gather(single, *batch)
+        finally:
+            await pipeline.stop()
+
+        # Ahead of it: the jobs already inside the stages (one per worker)
+        # and at most the batch's turn in the current round-robin round
+        workers = sum(stage.workers for stage in pipeline.stages)
+        self.assertLessEqual(started.index(2), workers + 1)
+
+    async def test_in_flight_jobs_are_capped(self):
+        gate = asyncio.Event()
+        gate.set()
+        pipeline = self.build_pipeline([], gate)
+        pipeline.max_in_flight = 5
+        peak = 0
+
+        async def watch() -> None:
+            nonlocal peak
+            while True:
+                inside = sum(
+                    stage.busy + (stage.queue.qsize() if stage.queue else 0)
+                    for stage in pipeline.stages
+                )
+                peak = max(peak, inside)
+                await asyncio.sleep(0)
+
+        pipeline.start()
+        watcher = asyncio.ensure_future(watch())
+        try:
+            await asyncio.gather(*(
+                pipeline.submit(PipelineJob(user_id=1)) for _ in range(20)
+            ))
+        finally:
+            watcher.cancel()
+            await pipeline.stop()
+
+        self.assertLessEqual(peak, 5)
+
+if __name__ == "__main__":
+    unittest.main()
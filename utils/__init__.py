@@ -1,19 +1,18 @@
 from .helpers import (
     clean_temp_files,
     format_size,
-    cleanup_old_data,
-    download_image
+    cleanup_old_data
 )
-from .decorators import admin_only, rate_limit, handle_errors
+from .decorators import admin_only, rate_limit, in_background, handle_errors
 from .error_handler import handle_error
 
 __all__ = [
     'clean_temp_files',
     'format_size',
     'cleanup_old_data',
-    'download_image',
     'admin_only',
     'rate_limit',
+    'in_background',
     'handle_errors',
     'handle_error'
 ]
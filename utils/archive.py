@@ -0,0 +1,53 @@
+from typing import List, Optional
+from config import SUPPORTED_FORMATS
+import asyncio
+import os
+import zipfile
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ZipStreamWriter:
+    """
+    Build a ZIP on disk one entry at a time as results come in.
+
+    Nothing is held in memory beyond the entry being written. Images are
+    stored without deflate since they are already compressed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._zip: Optional[zipfile.ZipFile] = zipfile.ZipFile(path, "w")
+        self._lock = asyncio.Lock()
+        self.entries = 0
+
+    async def add(self, arcname: str, data: bytes, deflate: bool = False) -> None:
+        """
+        Append one file to the archive.
+
+        Args:
+            arcname (str): Path of the file inside the archive
+            data (bytes): File contents
+            deflate (bool): Deflate the entry, for text such as manifests
+        """
+        compression = zipfile.ZIP_DEFLATED if deflate else zipfile.ZIP_STORED
+        async with self._lock:
+            await asyncio.to_thread(self._zip.writestr, arcname, data, compression)
+            self.entries += 1
+
+    async def close(self) -> None:
+        """Write the central directory and close the file."""
+        async with self._lock:
+            if self._zip:
+                await asyncio.to_thread(self._zip.close)
+                self._zip = None
+
+def is_image_member(info: zipfile.ZipInfo) -> bool:
+    """Check whether an archive member is an image we can compress."""
+    if info.is_dir() or info.filename.startswith("__MACOSX/"):
+        return False
+    return os.path.splitext(info.filename)[1].lower() in SUPPORTED_FORMATS
+
+def list_image_members(archive: zipfile.ZipFile) -> List[zipfile.ZipInfo]:
+    """List the compressible members of an archive in archive order."""
+    return [info for info in archive.infolist() if is_image_member(info)]
@@ -0,0 +1,122 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from collections import OrderedDict
+import time
+
+class LRUCache:
+    """In-memory mapping that keeps at most ``max_size`` recently used entries."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._data = OrderedDict()
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """Get a value and mark it as recently used."""
+        if key not in self._data:
+            return default
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entry if full."""
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """Remove a key and return its value."""
+        return self._data.pop(key, default)
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+class TTLCache(LRUCache):
+    """
+    ``LRUCache`` whose entries also expire after a time to live.
+
+    ``None`` is cached too (negative caching), with its own usually shorter
+    TTL, so lookups of absent records don't hit the database every time.
+    """
+
+    def __init__(self, max_size: int, ttl: float, negative_ttl: Optional[float] = None):
+        super().__init__(max_size)
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.hits = 0
+        self.misses = 0
+        # Bumped on every invalidation so loads started before it aren't stored
+        self._version = 0
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """Get a live value and mark it as recently used."""
+        found, value = self._lookup(key)
+        return value if found else default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value; ``None`` is kept for ``negative_ttl`` seconds."""
+        ttl = self.negative_ttl if value is None else self.ttl
+        super().set(key, (value, time.monotonic() + ttl))
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop a key after the record behind it changed."""
+        self._version += 1
+        self.pop(key)
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        self._version += 1
+        super().clear()
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Read-through lookup.
+
+        Args:
+            key (Hashable): Cache key
+            loader (Callable[[], Awaitable[Any]]): Fetches the value on a miss;
+                exceptions propagate and nothing is cached
+
+        Returns:
+            Any: The cached or freshly loaded value
+        """
+        found, value = self._lookup(key)
+        if found:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        version = self._version
+        value = await loader()
+        if version == self._version:
+            self.set(key, value)
+        return value
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get size and hit rate."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups * 100 if lookups else 0
+        }
+
+    def _lookup(self, key: Hashable) -> Tuple[bool, Any]:
+        entry = super().get(key)
+        if entry is None:
+            return False, None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            self.pop(key)
+            return False, None
+        return True, value
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._lookup(key)[0]
@@ -1,13 +1,17 @@
 from functools import wraps
-from typing import Callable, Any
+from typing import Callable, Any, Optional, Set
 from pyrogram.types import Message
 from pyrogram import Client
-from datetime import datetime
-from config import ADMIN_IDS, RATE_LIMIT_SECONDS
+from config import ADMIN_IDS
+from utils.rate_limiter import rate_limiter
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Strong references, the event loop only keeps weak ones to running tasks
+_background_tasks: Set[asyncio.Task] = set()
+
 def admin_only(func: Callable) -> Callable:
     """Decorator to restrict command to admin only."""
     @wraps(func)
@@ -19,36 +23,54 @@ def admin_only(func: Callable) -> Callable:
         return await func(client, message, *args, **kwargs)
     return wrapper
 
-def rate_limit(func: Callable) -> Callable:
-    """Rate limiting decorator with memory management."""
-    last_called = {}
-    
+def rate_limit(func: Optional[Callable] = None, command_class: str = "default") -> Callable:
+    """
+    Rate limiting decorator backed by the shared token-bucket limiter.
+
+    Use as ``@rate_limit`` or ``@rate_limit(command_class="url")``. Works on
+    plain handlers and on handler methods. Only the first rejection of a
+    streak gets a reply; later ones are dropped silently.
+    """
+    if func is None:
+        return lambda f: rate_limit(f, command_class)
+
     @wraps(func)
-    async def wrapper(client: Client, message: Message, *args: Any, **kwargs: Any) -> Any:
-        if not isinstance(message, Message):
-            return await func(client, message, *args, **kwargs)
-            
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        message = next((arg for arg in args if isinstance(arg, Message)), None)
+        if message is None or not message.from_user:
+            return await func(*args, **kwargs)
+
         user_id = message.from_user.id
-        current_time = datetime.now()
-        
-        # Cleanup old entries
-        for uid in list(last_called.keys()):
-            if (current_time - last_called[uid]).total_seconds() > RATE_LIMIT_SECONDS * 2:
-                del last_called[uid]
-        
-        if user_id in last_called:
-            time_passed = (current_time - last_called[user_id]).total_seconds()
-            if time_passed < RATE_LIMIT_SECONDS:
-                await message.reply_text(
-                    f"⚠️ Please wait {int(RATE_LIMIT_SECONDS - time_passed)} seconds."
-                )
-                logger.info(f"Rate limit hit for user {user_id}")
-                return
-        
-        last_called[user_id] = current_time
-        return await func(client, message, *args, **kwargs)
+        allowed, retry_after, should_notify = await rate_limiter.acquire(user_id, command_class)
+        if not allowed:
+            if should_notify:
+                await message.reply_text(f"⚠️ Please wait {max(1, int(retry_after + 0.5))} seconds.")
+            logger.info(f"Rate limit hit for user {user_id} ({command_class})")
+            return
+
+        return await func(*args, **kwargs)
     return wrapper
 
+def in_background(func: Callable) -> Callable:
+    """
+    Run a handler in its own task and return to Pyrogram right away.
+
+    Pyrogram has only a few update workers. Handlers that wait on the
+    compression pipeline would otherwise hold them, and updates from other
+    users would not even reach the pipeline's fair queue until they free up.
+    """
+    @wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> None:
+        task = asyncio.ensure_future(func(*args, **kwargs))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_done)
+    return wrapper
+
+def _background_done(task: asyncio.Task) -> None:
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception():
+        logger.error("Error in background handler", exc_info=task.exception())
+
 def handle_errors(func: Callable) -> Callable:
     """Error handling decorator."""
     @wraps(func)
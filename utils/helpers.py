@@ -1,12 +1,17 @@
-from typing import Optional, Tuple, List
+from typing import Any, Dict, Optional, Tuple, List, Union, BinaryIO
 import os
-from datetime import datetime, timedelta
+import time
 import logging
 from PIL import Image
-import aiohttp
 import aiofiles
-from config import MAX_FILE_SIZE, SUPPORTED_FORMATS, USER_DATA_EXPIRY_HOURS, RATE_LIMIT_CLEANUP_HOURS
-from database.mongodb import db
+from config import (
+    MAX_FILE_SIZE,
+    SUPPORTED_FORMATS,
+    ERROR_MESSAGES,
+    DOWNLOAD_CHUNK_SIZE,
+    TEMP_FILE_MIN_AGE_MINUTES
+)
+from utils.http_client import download_client
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +25,11 @@ async def clean_temp_files(file_paths: List[str]) -> None:
         except Exception as e:
             logger.error(f"Error deleting file {path}: {str(e)}")
 
+async def read_file(path: str) -> bytes:
+    """Read a whole file without blocking the event loop."""
+    async with aiofiles.open(path, 'rb') as f:
+        return await f.read()
+
 def format_size(size_bytes: int) -> str:
     """Format file size to human readable format."""
     for unit in ['B', 'KB', 'MB', 'GB']:
@@ -28,38 +38,36 @@ def format_size(size_bytes: int) -> str:
         size_bytes /= 1024
     return f"{size_bytes:.2f} TB"
 
+def format_batch_summary(succeeded: int, total: int, original_size: int, compressed_size: int) -> str:
+    """Format the closing message of a batch (album, link list or archive)."""
+    return (
+        f"✅ Compressed {succeeded}/{total} images\n\n"
+        f"Original Size: {format_size(original_size)}\n"
+        f"Compressed Size: {format_size(compressed_size)}\n"
+        f"Space Saved: {format_size(original_size - compressed_size)}"
+    )
+
 async def cleanup_old_data():
-    """Clean up old data from the database periodically."""
-    try:
-        # Calculate cutoff times
-        usage_cutoff = datetime.utcnow() - timedelta(hours=USER_DATA_EXPIRY_HOURS)
-        rate_limit_cutoff = datetime.utcnow() - timedelta(hours=RATE_LIMIT_CLEANUP_HOURS)
-
-        # Clean up old usage stats
-        result = await db.usage_stats.delete_many({
-            "timestamp": {"$lt": usage_cutoff}
-        })
-        logger.info(f"Cleaned up {result.deleted_count} old usage stats")
-
-        # Clean up old rate limit records
-        result = await db.rate_limits.delete_many({
-            "timestamp": {"$lt": rate_limit_cutoff}
-        })
-        logger.info(f"Cleaned up {result.deleted_count} old rate limit records")
-
-        # Clean up old logs
-        result = await db.logs.delete_many({
-            "timestamp": {"$lt": usage_cutoff}
-        })
-        logger.info(f"Cleaned up {result.deleted_count} old logs")
+    """
+    Clean up leftover temporary files periodically.
+
+    Only files untouched for ``TEMP_FILE_MIN_AGE_MINUTES`` are removed, so
+    long-running jobs such as archives keep their working files.
 
+    Old logs, usage stats and rate limit records are expired by MongoDB
+    through the TTL and time series settings in ``MongoDB.init_indexes``.
+    """
+    try:
         # Clean up temporary files in temp directory
         temp_dir = "temp"
+        # Files written to recently may belong to a job still running
+        cutoff = time.time() - TEMP_FILE_MIN_AGE_MINUTES * 60
         file_paths = []
         for filename in os.listdir(temp_dir):
             if filename != ".gitkeep":  # Skip .gitkeep file
                 file_path = os.path.join(temp_dir, filename)
-                file_paths.append(file_path)
+                if os.path.isfile(file_path) and os.path.getmtime(file_path) < cutoff:
+                    file_paths.append(file_path)
         
         if file_paths:
             await clean_temp_files(file_paths)
@@ -84,34 +92,81 @@ def get_image_info(file_path: str) -> Optional[Tuple[str, int, int]]:
         logger.error(f"Error getting image info: {str(e)}")
         return None
 
-async def download_image(url: str, output_path: str) -> tuple[bool, str]:
+async def fetch_url(
+    url: str,
+    output_path: str,
+    max_size: int = MAX_FILE_SIZE,
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None
+) -> Dict[str, Any]:
     """
-    Download an image from a URL.
-    
+    Download a URL to disk, revalidating a cached copy when validators are given.
+
+    The transfer is aborted as soon as ``Content-Length`` or the running
+    byte count exceeds ``max_size``.
+
     Args:
         url (str): URL of the image to download
         output_path (str): Path to save the downloaded image
-        
+        max_size (int): Largest accepted body in bytes
+        etag (Optional[str]): ETag of the cached copy, sent as If-None-Match
+        last_modified (Optional[str]): Last-Modified of the cached copy, sent as If-Modified-Since
+
     Returns:
-        tuple[bool, str]: (Success status, Error message if any)
+        Dict[str, Any]: success, error, not_modified and the response's
+        etag/last_modified validators
     """
+    result = {"success": False, "error": "", "not_modified": False, "etag": None, "last_modified": None}
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    too_large = False
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                if response.status != 200:
-                    return False, f"HTTP error {response.status}"
-                
-                async with aiofiles.open(output_path, 'wb') as f:
-                    await f.write(await response.read())
-                    
-        return True, ""
+        session = await download_client.get_session()
+        async with session.get(url, headers=headers) as response:
+            if response.status == 304 and headers:
+                result.update(success=True, not_modified=True)
+                return result
+
+            if response.status != 200:
+                result["error"] = f"HTTP error {response.status}"
+                return result
+
+            if response.content_length and response.content_length > max_size:
+                result["error"] = ERROR_MESSAGES["file_too_large"]
+                return result
+
+            received = 0
+            async with aiofiles.open(output_path, 'wb') as f:
+                async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                    received += len(chunk)
+                    if received > max_size:
+                        too_large = True
+                        break
+                    await f.write(chunk)
+
+            result["etag"] = response.headers.get("ETag")
+            result["last_modified"] = response.headers.get("Last-Modified")
+
+        if too_large:
+            await clean_temp_files([output_path])
+            result["error"] = ERROR_MESSAGES["file_too_large"]
+            return result
+
+        result["success"] = True
+        return result
         
     except Exception as e:
         logger.error(f"Error downloading image: {str(e)}")
-        return False, str(e)
+        await clean_temp_files([output_path])
+        result["error"] = str(e)
+        return result
 
-def is_valid_image_file(file_path: str) -> bool:
-    """Check if file is a valid image."""
+def is_valid_image_file(file_path: Union[str, BinaryIO]) -> bool:
+    """Check if a file path or file object holds a valid image."""
     try:
         with Image.open(file_path) as img:
             img.verify()
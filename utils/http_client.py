@@ -0,0 +1,54 @@
+from typing import Optional
+import aiohttp
+from config import (
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_CONNECTIONS_PER_HOST,
+    HTTP_DNS_CACHE_SECONDS,
+    HTTP_TIMEOUT_SECONDS
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+class DownloadClient:
+    """
+    Long-lived aiohttp session for image downloads.
+
+    Owned by the bot lifecycle so connections, keep-alive and DNS lookups
+    are reused across URL jobs instead of rebuilt for every download.
+    """
+
+    def __init__(self):
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self) -> None:
+        """Open the pooled session."""
+        if self._session and not self._session.closed:
+            return
+
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_MAX_CONNECTIONS,
+            limit_per_host=HTTP_MAX_CONNECTIONS_PER_HOST,
+            ttl_dns_cache=HTTP_DNS_CACHE_SECONDS,
+            enable_cleanup_closed=True
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT_SECONDS, sock_connect=10)
+        )
+        logger.info("Download client started")
+
+    async def close(self) -> None:
+        """Close the session and its connections."""
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Get the shared session, opening it on first use."""
+        if not self._session or self._session.closed:
+            await self.start()
+        return self._session
+
+# Shared client so every download reuses the same connection pool
+download_client = DownloadClient()
@@ -0,0 +1,117 @@
+from typing import Any, Dict, Optional
+from collections import OrderedDict, deque
+import asyncio
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+class JobScheduler:
+    """
+    Weighted fair queue of jobs, one FIFO per user.
+
+    Users are served round-robin; in each round a user may start up to
+    ``weight`` jobs, so a user with weight 3 gets three times the share
+    of one with weight 1 and nobody can starve the others by sending a
+    large batch.
+    """
+
+    def __init__(self):
+        self._queues: "OrderedDict[int, deque]" = OrderedDict()  # rotation order
+        self._weights: Dict[int, int] = {}
+        self._credits: Dict[int, int] = {}
+        self._ready: Optional[asyncio.Event] = None
+        self.dispatched = 0
+        self.total_wait = 0.0
+        self.completed = 0
+        self.total_processing = 0.0
+
+    def put(self, job: Any, weight: int = 1) -> None:
+        """Queue a job behind the same user's earlier jobs."""
+        user_id = job.user_id
+        job.enqueued_at = time.monotonic()
+        if user_id not in self._queues:
+            self._queues[user_id] = deque()
+            self._credits[user_id] = weight
+        self._weights[user_id] = weight
+        self._queues[user_id].append(job)
+        self._event().set()
+
+    async def get(self) -> Any:
+        """Wait for and return the next job in fair order."""
+        while not self._queues:
+            self._event().clear()
+            await self._event().wait()
+
+        user_id, queue = next(iter(self._queues.items()))
+        job = queue.popleft()
+        self._credits[user_id] -= 1
+
+        if not queue:
+            del self._queues[user_id]
+            del self._credits[user_id]
+            del self._weights[user_id]
+        elif self._credits[user_id] <= 0:
+            # Turn used up, go to the back of the rotation
+            self._credits[user_id] = self._weights[user_id]
+            self._queues.move_to_end(user_id)
+
+        job.started_at = time.monotonic()
+        self.dispatched += 1
+        self.total_wait += job.started_at - job.enqueued_at
+        return job
+
+    def record_processing(self, seconds: float) -> None:
+        """Record how long a dispatched job took to finish."""
+        self.completed += 1
+        self.total_processing += seconds
+
+    def position(self, job: Any) -> int:
+        """
+        Estimate a queued job's position, 1 being the next to start.
+
+        Args:
+            job (Any): A job previously passed to ``put``
+
+        Returns:
+            int: Position in the dispatch order, 0 if not queued
+        """
+        queue = self._queues.get(job.user_id)
+        if not queue or job not in queue:
+            return 0
+
+        own_left = queue.index(job) + 1
+        remaining = {user_id: len(q) for user_id, q in self._queues.items()}
+        credits = dict(self._credits)
+        order = deque(self._queues.keys())
+        position = 0
+
+        # Replay the round-robin on queue lengths only
+        while order:
+            user_id = order.popleft()
+            take = min(credits[user_id], remaining[user_id])
+            if user_id == job.user_id and own_left <= take:
+                return position + own_left
+            if user_id == job.user_id:
+                own_left -= take
+            position += take
+            remaining[user_id] -= take
+            credits[user_id] = self._weights[user_id]
+            if remaining[user_id]:
+                order.append(user_id)
+        return position
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue length and average wait/processing times."""
+        return {
+            "queued": sum(len(q) for q in self._queues.values()),
+            "users": len(self._queues),
+            "avg_wait": self.total_wait / self.dispatched if self.dispatched else 0,
+            "avg_processing": self.total_processing / self.completed if self.completed else 0
+        }
+
+    def _event(self) -> asyncio.Event:
+        # Created lazily so it binds to the running loop
+        if self._ready is None:
+            self._ready = asyncio.Event()
+        return self._ready
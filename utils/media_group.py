@@ -0,0 +1,47 @@
+from typing import Awaitable, Callable, Dict, List
+from pyrogram.types import Message
+from config import MEDIA_GROUP_WINDOW_SECONDS
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class MediaGroupCollector:
+    """
+    Gather the messages of a Telegram album before handling them together.
+
+    Album items arrive as separate updates a few milliseconds apart. Each
+    item restarts a short timer, and once the album goes quiet the whole
+    group is passed to the callback in message order.
+    """
+
+    def __init__(
+        self,
+        callback: Callable[[List[Message]], Awaitable[None]],
+        window: float = MEDIA_GROUP_WINDOW_SECONDS
+    ):
+        self.callback = callback
+        self.window = window
+        self._groups: Dict[str, List[Message]] = {}
+        self._timers: Dict[str, asyncio.Task] = {}
+
+    def add(self, message: Message) -> None:
+        """Add an album item and push back the group's flush."""
+        group_id = message.media_group_id
+        self._groups.setdefault(group_id, []).append(message)
+
+        timer = self._timers.get(group_id)
+        if timer:
+            timer.cancel()
+        self._timers[group_id] = asyncio.ensure_future(self._flush_later(group_id))
+
+    async def _flush_later(self, group_id: str) -> None:
+        await asyncio.sleep(self.window)
+
+        # Detach the group first so late items start a new one
+        self._timers.pop(group_id, None)
+        messages = sorted(self._groups.pop(group_id, []), key=lambda m: m.id)
+        try:
+            await self.callback(messages)
+        except Exception as e:
+            logger.error(f"Error handling media group {group_id}: {str(e)}", exc_info=True)
@@ -0,0 +1,203 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from utils.job_scheduler import JobScheduler
+import asyncio
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+class PipelineJob:
+    """Base class for work items travelling through a ``Pipeline``."""
+
+    def __init__(self, user_id: int = 0):
+        self.user_id = user_id
+        self.weight = 1
+        self.enqueued_at: Optional[float] = None
+        self.started_at: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self._future: Optional[asyncio.Future] = None
+        # Whether the job holds one of the pipeline's in-flight slots
+        self._holds_slot = False
+
+    def finish(self, result: Dict[str, Any]) -> None:
+        """Complete the job; later stages are skipped."""
+        self.result = result
+
+    @property
+    def finished(self) -> bool:
+        return self.result is not None
+
+class Stage:
+    """
+    One pipeline stage: a bounded queue drained by a fixed worker pool.
+
+    A full queue blocks the previous stage, so a slow stage pushes back
+    on everything upstream instead of piling up work in memory.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[PipelineJob], Awaitable[None]],
+        workers: int,
+        queue_size: int
+    ):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.queue_size = queue_size
+        self.next_stage: Optional["Stage"] = None
+        # Called with every job that finishes in this stage
+        self.on_finish: Optional[Callable[[PipelineJob], None]] = None
+        self.queue: Optional[asyncio.Queue] = None
+        self.busy = 0
+        self.processed = 0
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        """Create the queue and workers on the running loop."""
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [
+            asyncio.ensure_future(self._worker())
+            for _ in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        """Cancel the workers."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def put(self, job: PipelineJob) -> None:
+        """Queue a job, waiting while the stage is saturated."""
+        await self.queue.put(job)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the stage's load for the admin dashboard."""
+        return {
+            "name": self.name,
+            "workers": self.workers,
+            "busy": self.busy,
+            "queued": self.queue.qsize() if self.queue else 0,
+            "processed": self.processed
+        }
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self.queue.get()
+            self.busy += 1
+            try:
+                await self.handler(job)
+                if not job.finished and self.next_stage:
+                    await self.next_stage.put(job)
+                elif not job.finished:
+                    job.finish({"success": False, "error": f"Job left the pipeline at {self.name}"})
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in {self.name} stage: {str(e)}", exc_info=True)
+                job.finish({"success": False, "error": str(e)})
+            finally:
+                self.busy -= 1
+                self.processed += 1
+                self.queue.task_done()
+                if job.finished:
+                    if self.on_finish:
+                        self.on_finish(job)
+                    if job._future and not job._future.done():
+                        job._future.set_result(job.result)
+
+class Pipeline:
+    """
+    Chain of stages, each with its own concurrency limit and queue.
+
+    With a ``JobScheduler``, submitted jobs wait in its fair queue and a
+    dispatcher feeds the first stage. At most ``max_in_flight`` jobs are
+    inside the stages at once, by default one per worker, so the stage
+    queues never hold a backlog that would sit in front of a newly
+    dispatched job; the waiting happens in the fair queue instead.
+    """
+
+    def __init__(
+        self,
+        stages: List[Stage],
+        scheduler: Optional[JobScheduler] = None,
+        max_in_flight: Optional[int] = None
+    ):
+        self.stages = stages
+        self.scheduler = scheduler
+        self.max_in_flight = max_in_flight or sum(stage.workers for stage in stages)
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        for current, following in zip(stages, stages[1:]):
+            current.next_stage = following
+        for stage in stages:
+            stage.on_finish = self._release_slot
+
+    def start(self) -> None:
+        """Start every stage's workers."""
+        for stage in self.stages:
+            stage.start()
+        if self.scheduler:
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+            self._dispatcher = asyncio.ensure_future(self._dispatch())
+        logger.info(
+            "Pipeline started: " +
+            ", ".join(f"{stage.name}={stage.workers}" for stage in self.stages)
+        )
+
+    async def stop(self) -> None:
+        """Stop every stage's workers."""
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, return_exceptions=True)
+        for stage in self.stages:
+            await stage.stop()
+
+    async def submit(self, job: PipelineJob) -> Dict[str, Any]:
+        """
+        Run a job through all stages.
+
+        Args:
+            job (PipelineJob): The job to process
+
+        Returns:
+            Dict[str, Any]: The result the job finished with
+        """
+        job._future = asyncio.get_running_loop().create_future()
+        if not self.scheduler:
+            await self.stages[0].put(job)
+            return await job._future
+
+        self.scheduler.put(job, job.weight)
+        await self.on_queued(job)
+        result = await job._future
+
+        processing_time = time.monotonic() - job.started_at
+        self.scheduler.record_processing(processing_time)
+        logger.info(
+            f"Job for user {job.user_id} waited {job.started_at - job.enqueued_at:.2f}s, "
+            f"processed in {processing_time:.2f}s"
+        )
+        return result
+
+    async def on_queued(self, job: PipelineJob) -> None:
+        """Hook called after a job enters the scheduler's queue."""
+
+    async def _dispatch(self) -> None:
+        while True:
+            # Pick the next job only once there is room, so it's chosen in fair order
+            await self._slots.acquire()
+            job = await self.scheduler.get()
+            job._holds_slot = True
+            await self.stages[0].put(job)
+
+    def _release_slot(self, job: PipelineJob) -> None:
+        if job._holds_slot:
+            job._holds_slot = False
+            self._slots.release()
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """Get per-stage load."""
+        return [stage.get_stats() for stage in self.stages]
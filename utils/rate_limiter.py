@@ -0,0 +1,164 @@
+from typing import Dict, List, Tuple
+from config import RATE_LIMITS, DISTRIBUTED_RATE_LIMIT, RATE_LIMIT_LEASE_SIZE
+from database.rate_limit_db import take_token
+import heapq
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Tokens left for one user and command class."""
+
+    __slots__ = ("tokens", "updated_at", "notified", "leased")
+
+    def __init__(self, tokens: float, updated_at: float):
+        self.tokens = tokens
+        self.updated_at = updated_at
+        # Whether the user was already told about the current rejection streak
+        self.notified = False
+        # Tokens already taken from the shared MongoDB bucket, not yet used
+        self.leased = 0
+
+class RateLimiter:
+    """
+    Token-bucket rate limiter shared by every handler.
+
+    Each command class has its own burst size and refill time. Buckets
+    that have refilled completely are indistinguishable from new ones, so
+    they are dropped through a heap ordered by the time they become full
+    instead of sweeping all users on every message.
+    """
+
+    def __init__(
+        self,
+        limits: Dict[str, Tuple[int, float]] = RATE_LIMITS,
+        distributed: bool = DISTRIBUTED_RATE_LIMIT,
+        lease_size: int = RATE_LIMIT_LEASE_SIZE
+    ):
+        self.limits = limits
+        self.distributed = distributed
+        self.lease_size = lease_size
+        self._buckets: Dict[Tuple[int, str], TokenBucket] = {}
+        # (time the bucket is full again, key); one entry per bucket
+        self._expiry: List[Tuple[float, Tuple[int, str]]] = []
+        self.rejected = 0
+        self.remote_checks = 0
+
+    async def acquire(self, user_id: int, command_class: str = "default") -> Tuple[bool, float, bool]:
+        """
+        Take a token, confirming with the shared MongoDB bucket when distributed.
+
+        The local bucket never allows more than the shared one, so local
+        rejections (the bulk of them during spam) need no round-trip. Tokens
+        are leased from the shared bucket up to ``lease_size`` at a time, and
+        allowed requests spend the lease before going back to MongoDB. When
+        the shared bucket refuses, the local one is drained to match so that
+        the following requests are refused locally as well.
+
+        Returns:
+            Tuple[bool, float, bool]: Same as ``check``.
+        """
+        allowed, retry_after, should_notify = self.check(user_id, command_class)
+        if not allowed or not self.distributed:
+            return allowed, retry_after, should_notify
+
+        key = (user_id, command_class)
+        bucket = self._buckets[key]
+        if bucket.leased >= 1:
+            bucket.leased -= 1
+            return True, 0.0, False
+
+        burst, refill_seconds = self.limits.get(command_class, self.limits["default"])
+        self.remote_checks += 1
+        try:
+            granted, retry_after = await take_token(
+                user_id,
+                command_class,
+                burst,
+                refill_seconds,
+                min(burst, self.lease_size)
+            )
+        except Exception as e:
+            # Fail open, the local bucket still caps this instance
+            logger.error(f"Distributed rate limit check failed: {str(e)}")
+            return True, 0.0, False
+
+        # Other users' checks may have expired the bucket during the round-trip
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(burst, now)
+            heapq.heappush(self._expiry, (now, key))
+
+        if granted:
+            bucket.leased = granted - 1
+            return True, 0.0, False
+
+        self.rejected += 1
+        bucket.tokens = 1 - retry_after / refill_seconds
+        bucket.updated_at = now
+        should_notify = not bucket.notified
+        bucket.notified = True
+        return False, retry_after, should_notify
+
+    def check(self, user_id: int, command_class: str = "default") -> Tuple[bool, float, bool]:
+        """
+        Take a token for a user's request.
+
+        Args:
+            user_id (int): The Telegram user ID.
+            command_class (str): Key into ``RATE_LIMITS``.
+
+        Returns:
+            Tuple[bool, float, bool]: Whether the request is allowed, seconds
+            until the next token, and whether the user should be told.
+        """
+        now = time.monotonic()
+        self._expire(now)
+
+        burst, refill_seconds = self.limits.get(command_class, self.limits["default"])
+        key = (user_id, command_class)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(burst, now)
+            heapq.heappush(self._expiry, (now, key))
+        else:
+            bucket.tokens = min(burst, bucket.tokens + (now - bucket.updated_at) / refill_seconds)
+            bucket.updated_at = now
+
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
+            bucket.notified = False
+            return True, 0.0, False
+
+        self.rejected += 1
+        should_notify = not bucket.notified
+        bucket.notified = True
+        return False, (1 - bucket.tokens) * refill_seconds, should_notify
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get the number of tracked buckets, rejections and MongoDB round-trips."""
+        return {
+            "buckets": len(self._buckets),
+            "rejected": self.rejected,
+            "remote_checks": self.remote_checks
+        }
+
+    def _expire(self, now: float) -> None:
+        while self._expiry and self._expiry[0][0] <= now:
+            _, key = heapq.heappop(self._expiry)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                continue
+
+            burst, refill_seconds = self.limits.get(key[1], self.limits["default"])
+            full_at = bucket.updated_at + (burst - bucket.tokens) * refill_seconds
+            if full_at <= now:
+                del self._buckets[key]
+            else:
+                # Used since it was scheduled, check again once it has refilled
+                heapq.heappush(self._expiry, (full_at, key))
+
+# Shared limiter so all handlers draw from the same buckets
+rate_limiter = RateLimiter()
@@ -0,0 +1,54 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one in-flight job.
+
+    The first caller for a key starts the job; callers arriving while it
+    runs wait on the same task and receive its result (or exception).
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.coalesced = 0
+
+    @property
+    def in_flight(self) -> int:
+        """Number of distinct keys currently running."""
+        return len(self._calls)
+
+    async def run(
+        self,
+        key: Hashable,
+        factory: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, bool]:
+        """
+        Run ``factory()`` once per key among concurrent callers.
+
+        Args:
+            key (Hashable): Identity of the work, e.g. file_unique_id or URL
+            factory (Callable[[], Awaitable[Any]]): Starts the job when no call is in flight
+
+        Returns:
+            Tuple[Any, bool]: The job result and whether this caller joined
+            someone else's job instead of running it
+        """
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+            logger.debug(f"Joined in-flight job for {key}")
+            # Shield so a cancelled waiter does not cancel the shared job
+            return await asyncio.shield(task), True
+
+        task = asyncio.ensure_future(factory())
+        self._calls[key] = task
+        task.add_done_callback(lambda _: self._forget(key, task))
+        return await asyncio.shield(task), False
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
@@ -0,0 +1,138 @@
+from typing import Dict, List, Tuple
+from datetime import datetime
+from config import (
+    DAILY_QUOTA_COUNT,
+    DAILY_QUOTA_BYTES,
+    CUSTOM_KEY_DAILY_QUOTA_COUNT,
+    CUSTOM_KEY_DAILY_QUOTA_BYTES,
+    ERROR_MESSAGES
+)
+from database.mongodb import db
+import logging
+
+logger = logging.getLogger(__name__)
+
+class UsageQuota:
+    """
+    Per-user daily quotas checked against in-memory counters.
+
+    Counters are loaded from today's ``usage_stats`` at startup, bumped
+    locally on every compression and periodically reconciled with the
+    database, so a check never waits on MongoDB.
+
+    Jobs reserve their expected cost when they are queued and release it
+    when they finish, so a batch admitted just under the limit can't
+    overshoot it by the size of the batch.
+    """
+
+    def __init__(self):
+        self._day = self._today()
+        # user_id -> [compressions, original bytes] for the current UTC day
+        self._usage: Dict[int, List[int]] = {}
+        # user_id -> [jobs, expected bytes] queued or running
+        self._reserved: Dict[int, List[int]] = {}
+
+    def check(self, user_id: int, incoming_size: int = 0, custom_key: bool = False) -> Tuple[bool, str]:
+        """
+        Check whether a user may start another compression today.
+
+        Args:
+            user_id (int): The Telegram user ID.
+            incoming_size (int): Size of the file about to be processed, if known.
+            custom_key (bool): Whether the user compresses with their own API key.
+
+        Returns:
+            Tuple[bool, str]: Check result and user-facing error message.
+        """
+        self._roll_over()
+        count, size = self._usage.get(user_id, (0, 0))
+        reserved_count, reserved_size = self._reserved.get(user_id, (0, 0))
+        count += reserved_count
+        size += reserved_size
+        if custom_key:
+            max_count, max_bytes = CUSTOM_KEY_DAILY_QUOTA_COUNT, CUSTOM_KEY_DAILY_QUOTA_BYTES
+            error = ERROR_MESSAGES["custom_quota_exceeded"]
+        else:
+            max_count, max_bytes = DAILY_QUOTA_COUNT, DAILY_QUOTA_BYTES
+            error = ERROR_MESSAGES["quota_exceeded"]
+
+        if max_count and count >= max_count:
+            return False, error
+        if max_bytes and size + incoming_size > max_bytes:
+            return False, error
+        return True, ""
+
+    def reserve(self, user_id: int, expected_size: int = 0, custom_key: bool = False) -> Tuple[bool, str]:
+        """
+        Check the quota and, if there is room, hold one job's expected cost.
+
+        Every successful reservation must be undone with ``release`` once
+        the job is finished; ``record`` counts the actual usage.
+
+        Args:
+            user_id (int): The Telegram user ID.
+            expected_size (int): Size of the file about to be processed, if known.
+            custom_key (bool): Whether the user compresses with their own API key.
+
+        Returns:
+            Tuple[bool, str]: Reservation result and user-facing error message.
+        """
+        is_within_quota, error = self.check(user_id, expected_size, custom_key)
+        if is_within_quota:
+            reserved = self._reserved.setdefault(user_id, [0, 0])
+            reserved[0] += 1
+            reserved[1] += expected_size
+        return is_within_quota, error
+
+    def release(self, user_id: int, expected_size: int = 0) -> None:
+        """Drop a reservation made with ``reserve``."""
+        reserved = self._reserved.get(user_id)
+        if not reserved:
+            return
+        reserved[0] -= 1
+        reserved[1] -= expected_size
+        if reserved[0] <= 0:
+            del self._reserved[user_id]
+
+    def record(self, user_id: int, original_size: int) -> None:
+        """Count a finished compression against the user's quota."""
+        self._roll_over()
+        usage = self._usage.setdefault(user_id, [0, 0])
+        usage[0] += 1
+        usage[1] += original_size
+
+    async def hydrate(self) -> None:
+        """Load today's counters from usage_stats, keeping the higher value."""
+        self._roll_over()
+        try:
+            cursor = db.usage_stats.find(
+                {"date": self._day},
+                {"user_id": 1, "compressions": 1, "original_size": 1}
+            )
+            loaded = 0
+            async for doc in cursor:
+                usage = self._usage.setdefault(doc["user_id"], [0, 0])
+                # Other instances write here too, local counts may be behind
+                usage[0] = max(usage[0], doc.get("compressions", 0))
+                usage[1] = max(usage[1], doc.get("original_size", 0))
+                loaded += 1
+            logger.info(f"Loaded daily usage for {loaded} users")
+        except Exception as e:
+            logger.error(f"Error loading daily usage: {str(e)}")
+
+    # Reconciling is the same merge, run on a schedule
+    reconcile = hydrate
+
+    def _roll_over(self) -> None:
+        today = self._today()
+        if today != self._day:
+            self._day = today
+            self._usage.clear()
+
+    @staticmethod
+    def _today() -> str:
+        # Same UTC date format as usage_stats
+        return datetime.utcnow().strftime("%Y-%m-%d")
+
+# Shared counters so every handler sees the same usage
+usage_quota = UsageQuota()
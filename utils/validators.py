@@ -1,6 +1,9 @@
-from typing import Tuple
+from typing import List, Tuple, Optional
+import mimetypes
+import os
 import re
 from datetime import datetime
+from config import SUPPORTED_FORMATS, MAX_FILE_SIZE, ERROR_MESSAGES
 import logging
 
 logger = logging.getLogger(__name__)
@@ -69,4 +72,88 @@ def is_valid_image_url(url: str) -> bool:
     
     # Check if URL ends with supported image extensions
     valid_extensions = ('.jpg', '.jpeg', '.png', '.webp')
-    return any(clean_url.lower().endswith(ext) for ext in valid_extensions)
\ No newline at end of file
+    return any(clean_url.lower().endswith(ext) for ext in valid_extensions)
+
+URL_PATTERN = re.compile(r'https?://[^\s<>"]+')
+
+def extract_urls(text: str) -> List[str]:
+    """
+    Pull every http(s) link out of a message or text file.
+
+    Args:
+        text (str): Text to scan.
+
+    Returns:
+        List[str]: Unique URLs in the order they appear.
+    """
+    urls = []
+    for match in URL_PATTERN.findall(text or ""):
+        # Drop punctuation that ends the sentence rather than the URL
+        url = match.rstrip(".,;:!?)]}'")
+        if url not in urls:
+            urls.append(url)
+    return urls
+
+# Magic numbers of the formats we can compress
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+)
+
+SUPPORTED_MIME_TYPES = {
+    mimetypes.guess_type(f"image{ext}")[0] for ext in SUPPORTED_FORMATS
+} - {None}
+
+def validate_file_metadata(
+    file_name: Optional[str],
+    mime_type: Optional[str],
+    file_size: Optional[int]
+) -> Tuple[bool, str]:
+    """
+    Check Telegram document metadata before downloading anything.
+
+    Args:
+        file_name (Optional[str]): Document file name.
+        mime_type (Optional[str]): MIME type reported by Telegram.
+        file_size (Optional[int]): Size in bytes reported by Telegram.
+
+    Returns:
+        Tuple[bool, str]: Validation result and error message.
+    """
+    if file_size and file_size > MAX_FILE_SIZE:
+        return False, ERROR_MESSAGES["file_too_large"]
+
+    extension = os.path.splitext(file_name or "")[1].lower()
+    if extension not in SUPPORTED_FORMATS and mime_type not in SUPPORTED_MIME_TYPES:
+        return False, ERROR_MESSAGES["invalid_format"]
+
+    return True, ""
+
+def needs_content_sniff(file_name: Optional[str], mime_type: Optional[str]) -> bool:
+    """
+    Check whether metadata is too ambiguous to trust without looking at the bytes.
+
+    Args:
+        file_name (Optional[str]): Document file name.
+        mime_type (Optional[str]): MIME type reported by Telegram.
+
+    Returns:
+        bool: True if extension and MIME type do not both point to a supported format.
+    """
+    extension = os.path.splitext(file_name or "")[1].lower()
+    return extension not in SUPPORTED_FORMATS or mime_type not in SUPPORTED_MIME_TYPES
+
+def sniff_image_format(header: bytes) -> Optional[str]:
+    """
+    Detect a supported image format from the first bytes of a file.
+
+    Args:
+        header (bytes): Leading bytes of the file.
+
+    Returns:
+        Optional[str]: The matching extension, or None if unsupported.
+    """
+    for signature, extension in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return extension
+    return None